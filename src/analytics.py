@@ -0,0 +1,136 @@
+import argparse
+import logging
+from datetime import date
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy.orm import Session
+
+import database
+from streaming import ItemLevelRow, ProgressRow, stream_ilvl_history, stream_progress
+from weeks import RESET_WEEKDAY, reset_week_start
+
+log = logging.getLogger(__name__)
+
+# 1970-01-01, day zero for datetime64[D], was a Thursday.
+_EPOCH_WEEKDAY = 3
+
+
+def reset_week_starts(days: np.ndarray) -> np.ndarray:
+    """Vectorised `weeks.reset_week_start` for an array of datetime64[D]."""
+    ordinal = days.astype('datetime64[D]').astype(np.int64)
+    weekday = (ordinal + _EPOCH_WEEKDAY) % 7
+    return (ordinal - (weekday - RESET_WEEKDAY) % 7).astype('datetime64[D]')
+
+
+def load_progress(session: Session, since: Optional[date] = None) -> pd.DataFrame:
+    """All of `progress_log` since `since`, as one columnar frame."""
+    frame = pd.DataFrame.from_records(
+        stream_progress(session, since=since),
+        columns=ProgressRow._fields
+    )
+    return frame.astype({
+        'character_id': np.int32,
+        'record_date': 'datetime64[ns]',
+        'average_item_level': np.int16,
+        'pinnacle_quest_done': bool,
+        'profession_1_quest_done': bool,
+        'profession_2_quest_done': bool,
+        'delves_completed': np.int32,
+    })
+
+
+def load_item_levels(session: Session, since: Optional[date] = None) -> pd.DataFrame:
+    """Daily item levels since `since` (the per-day rollup of `gear_log`)."""
+    frame = pd.DataFrame.from_records(
+        stream_ilvl_history(session, since=since),
+        columns=ItemLevelRow._fields
+    )
+    return frame.astype({
+        'character_id': np.int32,
+        'record_date': 'datetime64[ns]',
+        'average_item_level': np.int16,
+    })
+
+
+def weekly_report(progress: pd.DataFrame, item_levels: pd.DataFrame) -> pd.DataFrame:
+    """One row per (character, reset week): quest flags, delves and item level gain."""
+    progress = progress.assign(
+        week_start=reset_week_starts(progress['record_date'].to_numpy('datetime64[D]'))
+    )
+    weekly_progress = progress.groupby(['character_id', 'week_start']).agg(
+        pinnacle=('pinnacle_quest_done', 'any'),
+        prof_1=('profession_1_quest_done', 'any'),
+        prof_2=('profession_2_quest_done', 'any'),
+        delves_completed=('delves_completed', 'sum'),
+    )
+
+    item_levels = item_levels.assign(
+        week_start=reset_week_starts(item_levels['record_date'].to_numpy('datetime64[D]'))
+    ).sort_values(['character_id', 'record_date'])
+    weekly_ilvl = item_levels.groupby(['character_id', 'week_start']).agg(
+        ilvl_start=('average_item_level', 'first'),
+        ilvl_end=('average_item_level', 'last'),
+    )
+    weekly_ilvl['ilvl_gain'] = weekly_ilvl['ilvl_end'] - weekly_ilvl['ilvl_start']
+
+    report = weekly_progress.join(weekly_ilvl, how='outer')
+    flags = ['pinnacle', 'prof_1', 'prof_2']
+    report[flags] = report[flags].fillna(False).astype(bool)
+    report['delves_completed'] = report['delves_completed'].fillna(0).astype(np.int32)
+
+    return report
+
+
+def completion_rates(report: pd.DataFrame) -> pd.DataFrame:
+    """Per reset week: share of characters with each weekly done, plus delve and ilvl totals."""
+    return report.groupby(level='week_start').agg(
+        characters=('pinnacle', 'size'),
+        pinnacle_rate=('pinnacle', 'mean'),
+        prof_1_rate=('prof_1', 'mean'),
+        prof_2_rate=('prof_2', 'mean'),
+        delves_completed=('delves_completed', 'sum'),
+        mean_ilvl_gain=('ilvl_gain', 'mean'),
+    )
+
+
+def slot_upgrades(slot_history: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Per-slot item levels and where each slot was upgraded, from `slot_pivot_sql`.
+
+    A slot that is empty for the whole window (the off hand behind a
+    two-hander) comes back as an all-NULL object column; it is dropped so
+    the rest can be treated as numbers. A slot was upgraded on a day its
+    item level went up from the last known value.
+    """
+    levels = slot_history.dropna(axis=1, how='all').astype('float64')
+    return levels, levels.ffill().diff().gt(0)
+
+
+def season_report(since: date) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    with database.get_session() as s:
+        progress = load_progress(s, since)
+        item_levels = load_item_levels(s, since)
+
+    report = weekly_report(progress, item_levels)
+    return report, completion_rates(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Reset-week report for the whole roster.')
+    parser.add_argument('--since', type=date.fromisoformat, required=True, help='First day to include (YYYY-MM-DD)')
+    parser.add_argument('--out', type=Path, help='Write the per-character report to this CSV')
+    args = parser.parse_args()
+
+    report, rates = season_report(reset_week_start(args.since))
+    print(rates.to_string())
+
+    if args.out is not None:
+        report.to_csv(args.out)
+        log.info(f'Wrote {len(report)} rows to {args.out}')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
@@ -0,0 +1,112 @@
+import argparse
+import logging
+from csv import reader as csv_reader
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from data_models import Annotation, WoWCharacter, init_db
+import database
+import ingest_events
+
+log = logging.getLogger(__name__)
+
+ANNOTATIONS_FILE = Path('ANNOTATIONS.csv')
+
+
+def read_annotations_csv(path: Path = ANNOTATIONS_FILE) -> List[Tuple[date, str]]:
+    output = []
+    with path.open(mode='r', newline='\n') as f:
+        ann = csv_reader(f, delimiter='|', quotechar='"')
+        next(ann)
+
+        for line in ann:
+            if line:
+                output.append((date.fromisoformat(line[0]), line[1]))
+
+    return output
+
+
+def get_annotations(
+    session: Session,
+    since: date,
+    until: date,
+    character_id: Optional[int] = None,
+) -> List[Tuple[date, str]]:
+    """Global annotations, plus `character_id`'s own, between `since` and `until`."""
+    stmt = (
+        select(Annotation.event_date, Annotation.event)
+        .where(Annotation.event_date.between(since, until))
+        .order_by(Annotation.event_date)
+    )
+    if character_id is None:
+        stmt = stmt.where(Annotation.character_id.is_(None))
+    else:
+        stmt = stmt.where(or_(Annotation.character_id.is_(None), Annotation.character_id == character_id))
+
+    return list(session.execute(stmt).tuples())
+
+
+def add_annotation(session: Session, event_date: date, event: str, character_id: Optional[int] = None) -> Annotation:
+    event = event.strip()
+    if not event:
+        raise ValueError('An annotation needs an event')
+
+    annotation = Annotation(event_date=event_date, event=event, character_id=character_id)
+    session.add(annotation)
+    ingest_events.notify_annotations_changed(session)
+    session.commit()
+
+    return annotation
+
+
+def import_csv(session: Session, path: Path = ANNOTATIONS_FILE) -> int:
+    """Load `ANNOTATIONS.csv` into the annotation table, skipping rows already there.
+
+    An event that starts with a tracked character's name ("NaturalGizmo hit
+    80") is scoped to that character; everything else is global.
+    """
+    names: Dict[str, List[int]] = {}
+    for character_id, name in session.execute(select(WoWCharacter.id, WoWCharacter.name)):
+        names.setdefault(name.lower(), []).append(character_id)
+
+    existing = set(session.execute(select(Annotation.event_date, Annotation.event)).tuples())
+
+    added = 0
+    for event_date, event in read_annotations_csv(path):
+        if (event_date, event) in existing:
+            continue
+
+        first_word = event.split(' ', 1)[0].lower()
+        matches = names.get(first_word, [])
+        character_id = matches[0] if len(matches) == 1 else None
+
+        session.add(Annotation(event_date=event_date, event=event, character_id=character_id))
+        added += 1
+
+    if added:
+        ingest_events.notify_annotations_changed(session)
+    session.commit()
+
+    return added
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import annotations from a pipe-delimited CSV.')
+    parser.add_argument('path', type=Path, nargs='?', default=ANNOTATIONS_FILE)
+    args = parser.parse_args()
+
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        init_db(conn)
+
+    with database.get_session() as s:
+        added = import_csv(s, args.path)
+    log.info(f'Imported {added} annotations.')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
@@ -0,0 +1,230 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import http_client
+import json_codec
+
+try:
+    import httpx
+except ImportError as e:  # pragma: no cover
+    raise ImportError("The HTTP/2 client needs httpx: `uv sync --extra http2`") from e
+
+log = logging.getLogger(__name__)
+
+# Connections per regional host. Each one carries many concurrent
+# streams, so a handful is enough for the whole roster.
+CONNECTIONS_PER_HOST = int(os.getenv("HTTP2_CONNECTIONS_PER_HOST", "4"))
+# Requests in flight per host; the API allows about 100 streams per connection.
+STREAMS_PER_HOST = int(os.getenv("HTTP2_STREAMS_PER_HOST", "256"))
+TIMEOUT = float(os.getenv("HTTP2_TIMEOUT", "30"))
+
+# Profile keys that link to a sub-resource worth fetching for a full profile.
+SUBRESOURCES = (
+    'equipment',
+    'media',
+    'specializations',
+    'statistics',
+    'mythic_keystone_profile',
+    'achievements',
+    'titles',
+    'pvp_summary',
+    'encounters',
+    'appearance',
+    'collections',
+    'reputations',
+    'quests',
+    'achievements_statistics',
+    'professions',
+)
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """Serve responses from an `http_client` fixture archive."""
+
+    def __init__(self, path: Path, latency_ms: float = 0):
+        self.fixtures = http_client.load_archive(path)
+        self.latency_ms = latency_ms
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        key = http_client.fixture_key(request.method, str(request.url), body)
+        entry = self.fixtures.get(key)
+        if entry is None:
+            raise httpx.ConnectError(f'No recorded response for {key}', request=request)
+
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        return httpx.Response(
+            entry['status'],
+            headers=entry.get('headers', {}),
+            content=entry['body'].encode('utf-8'),
+            request=request,
+        )
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """Send over HTTP/2 and append each response to an `http_client` fixture archive."""
+
+    def __init__(self, path: Path, transport: httpx.AsyncBaseTransport):
+        self.path = path
+        self.transport = transport
+        self._lock = asyncio.Lock()
+
+    def _append(self, line: str):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(self.path, 'at', encoding='utf-8') as f:
+            f.write(line)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        body = await request.aread()
+        response = await self.transport.handle_async_request(request)
+        content = await response.aread()
+
+        entry = {
+            'key': http_client.fixture_key(request.method, str(request.url), body),
+            'status': response.status_code,
+            'reason': response.reason_phrase,
+            'headers': {name: response.headers[name] for name in http_client.KEPT_HEADERS if name in response.headers},
+            'body': http_client.scrub(content.decode('utf-8', errors='replace')),
+        }
+        async with self._lock:
+            await asyncio.to_thread(self._append, json.dumps(entry, separators=(',', ':')) + '\n')
+
+        # `content` is already decoded, so the encoding headers no longer
+        # describe it; keeping them would make httpx decode it twice.
+        headers = [
+            (name, value)
+            for name, value in response.headers.raw
+            if name.lower() not in (b'content-encoding', b'content-length')
+        ]
+        return httpx.Response(
+            response.status_code,
+            headers=headers,
+            content=content,
+            request=request,
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class AsyncApiClient:
+    """HTTP/2 client with one small connection pool per regional host.
+
+    Every request to a host is multiplexed over at most
+    CONNECTIONS_PER_HOST connections, so fanning out to every linked
+    sub-resource for the whole roster needs a few sockets rather than
+    one per in-flight request. Honours HTTP_FIXTURES_MODE like the
+    blocking client.
+
+    Use as `async with AsyncApiClient(token) as client: ...`.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        mode: str = http_client.FIXTURES_MODE,
+        path: Path = http_client.FIXTURES_PATH,
+        latency_ms: float = http_client.FIXTURE_LATENCY_MS,
+    ):
+        self.token = token
+        self.mode = mode
+        self.path = path
+        self.latency_ms = latency_ms
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+
+    def _transport(self) -> httpx.AsyncBaseTransport:
+        if self.mode == 'replay':
+            return ReplayTransport(self.path, self.latency_ms)
+
+        transport = httpx.AsyncHTTPTransport(
+            http2=True,
+            limits=httpx.Limits(max_connections=CONNECTIONS_PER_HOST, max_keepalive_connections=CONNECTIONS_PER_HOST),
+        )
+        if self.mode == 'record':
+            return RecordingTransport(self.path, transport)
+        return transport
+
+    def _client(self, host: str) -> httpx.AsyncClient:
+        if host not in self._clients:
+            self._clients[host] = httpx.AsyncClient(
+                transport=self._transport(),
+                timeout=TIMEOUT,
+                headers={"Authorization": f"Bearer {self.token}"},
+            )
+            self._limits[host] = asyncio.Semaphore(STREAMS_PER_HOST)
+        return self._clients[host]
+
+    async def get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        host = urlsplit(url).netloc
+        client = self._client(host)
+        async with self._limits[host]:
+            response = await client.get(url, params=params)
+        response.raise_for_status()
+        return json_codec.loads(response.content)
+
+    async def get_equipment(self, url: str, params: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Like `get_json`, but only decodes `equipped_items` (see `json_codec`)."""
+        host = urlsplit(url).netloc
+        client = self._client(host)
+        async with self._limits[host]:
+            response = await client.get(url, params=params)
+        response.raise_for_status()
+        return {"equipped_items": json_codec.equipped_items(response.content)}
+
+    async def aclose(self):
+        await asyncio.gather(*[client.aclose() for client in self._clients.values()])
+        self._clients.clear()
+
+    async def __aenter__(self) -> "AsyncApiClient":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+
+def linked_hrefs(profile: Dict[str, Any], keys: List[str] | tuple = SUBRESOURCES) -> Dict[str, str]:
+    """Sub-resource links in a profile summary, e.g. {'equipment': 'https://...'}."""
+    return {
+        key: profile[key]['href']
+        for key in keys
+        if isinstance(profile.get(key), dict) and 'href' in profile[key]
+    }
+
+
+async def resolve_links(
+    client: AsyncApiClient,
+    profile: Dict[str, Any],
+    locale: str,
+    keys: List[str] | tuple = SUBRESOURCES,
+) -> Dict[str, Any]:
+    """Fetch every linked sub-resource of `profile` concurrently.
+
+    A sub-resource that fails is logged and left out rather than failing
+    the whole profile.
+    """
+    links = linked_hrefs(profile, keys)
+    params = {"locale": locale}
+
+    async def fetch(key: str, href: str):
+        if key == 'equipment':
+            return await client.get_equipment(href, params)
+        return await client.get_json(href, params)
+
+    results = await asyncio.gather(*[fetch(key, href) for key, href in links.items()], return_exceptions=True)
+
+    resolved = {}
+    for (key, href), result in zip(links.items(), results):
+        if isinstance(result, Exception):
+            log.warning(f'Could not fetch {key} ({href}): {result}')
+            continue
+        resolved[key] = result
+    return resolved
@@ -0,0 +1,180 @@
+import argparse
+import asyncio
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from tqdm.asyncio import tqdm_asyncio
+from tqdm.contrib.logging import logging_redirect_tqdm
+
+from data_models import init_db
+import database
+import chart_render
+import json_codec
+import main as ingest
+import profiling
+import wow_api_models as wow
+
+if TYPE_CHECKING:
+    from async_client import AsyncApiClient
+
+log = logging.getLogger(__name__)
+
+# How many characters may be fetching or writing at once. Database
+# connections are only checked out for the write itself, so this can be
+# much larger than the pool.
+CONCURRENCY = int(os.getenv("INGEST_CONCURRENCY", "200"))
+
+
+def fetch_character(key: str, token: str) -> tuple[Optional[int], Dict]:
+    region, realm, character_name = key.split('|')
+
+    level = None
+    try:
+        l_profile = wow.CharacterProfileSummary(
+            region=region,
+            realm=realm,
+            character_name=character_name,
+            token=token
+        )
+        l_profile.retrieve()
+        level = l_profile.level
+    except AttributeError as e:
+        log.error(f'Could not retrieve data for {character_name}.')
+        log.error(e)
+
+    equipment = ingest.get_equipment_for_character(region, realm, character_name)
+
+    return level, equipment
+
+
+async def fetch_character_http2(
+    client: "AsyncApiClient",
+    key: str,
+    enrich: bool = False,
+) -> tuple[Optional[int], Dict, Dict[str, Any]]:
+    """Fetch a profile and its equipment (or, with `enrich`, every linked
+    sub-resource) over the shared HTTP/2 client.
+
+    Like `fetch_character`, a failed profile lookup is logged and leaves
+    the level unknown; equipment is still fetched from its own URL.
+    """
+    import async_client
+    import httpx
+
+    region, realm, character_name = key.split('|')
+    l_profile = wow.CharacterProfileSummary(
+        region=region,
+        realm=realm,
+        character_name=character_name,
+    )
+
+    level = None
+    profile: Dict[str, Any] = {}
+    try:
+        profile = await l_profile.retrieve_async(client)
+        level = getattr(l_profile, 'level', None)
+    except (AttributeError, httpx.HTTPError) as e:
+        log.error(f'Could not retrieve data for {character_name}.')
+        log.error(e)
+
+    keys = async_client.SUBRESOURCES if enrich else ('equipment',)
+    linked = await async_client.resolve_links(client, profile, l_profile.locale, keys)
+    if 'equipment' not in linked:
+        linked['equipment'] = await client.get_equipment(f'{l_profile.url()}/equipment', l_profile.params())
+
+    return level, linked['equipment'], {**profile, **linked}
+
+
+def write_profile(output_dir: Path, region: str, realm: str, character_name: str, profile: Dict[str, Any]):
+    output_file = Path(output_dir, date.today().isoformat(), region, realm, character_name, 'profile.json')
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    output_file.write_bytes(json_codec.dumps(profile))
+
+
+def store_character(db_sess: Session, key: str, level: Optional[int], structured_gear: Dict[str, Dict]) -> int:
+    this_character = ingest.get_or_create_character(db_sess, key)
+    if level is not None:
+        this_character.level = level
+
+    ingest.record_gear(db_sess, this_character, structured_gear)
+    return this_character.id
+
+
+async def ingest_character(
+    sessions: async_sessionmaker[AsyncSession],
+    semaphore: asyncio.Semaphore,
+    key: str,
+    token: str,
+    output_dir: Path,
+    client: Optional["AsyncApiClient"] = None,
+    enrich: bool = False,
+) -> Optional[int]:
+    async with semaphore:
+        try:
+            region, realm, character_name = key.split('|')
+            if client is not None:
+                level, equipment, profile = await fetch_character_http2(client, key, enrich)
+                if enrich:
+                    await asyncio.to_thread(write_profile, output_dir, region, realm, character_name, profile)
+            else:
+                # The requests client is blocking, so keep it off the event loop.
+                level, equipment = await asyncio.to_thread(fetch_character, key, token)
+            structured_gear = ingest.structure_gear(equipment)
+
+            await asyncio.to_thread(ingest.write_snapshot, output_dir, region, realm, character_name, structured_gear)
+
+            async with sessions() as db_sess:
+                return await db_sess.run_sync(store_character, key, level, structured_gear)
+        except Exception as e:
+            log.error(f'Could not ingest {key}.')
+            log.error(e)
+            return None
+
+
+async def main(characters: Optional[List[str]] = None, http2: bool = False, enrich: bool = False):
+    if characters is None:
+        characters = ingest.list_of_characters
+
+    token = ingest.get_oauth_token(ingest.client_id, ingest.client_secret)["access_token"]
+    ingest.OAUTH_TOKEN = token
+    output_dir = Path('.', 'storage', 'equipment')
+
+    engine = database.get_async_engine()
+    async with engine.begin() as conn:
+        await conn.run_sync(init_db)
+
+    sessions = database.get_async_sessionmaker()
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    client = None
+    if http2 or enrich:
+        from async_client import AsyncApiClient
+        client = AsyncApiClient(token)
+
+    try:
+        ingested = await tqdm_asyncio.gather(*[
+            ingest_character(sessions, semaphore, key, token, output_dir, client, enrich)
+            for key in characters
+        ])
+    finally:
+        if client is not None:
+            await client.aclose()
+
+    await engine.dispose()
+
+    await asyncio.to_thread(chart_render.render_all, [i for i in ingested if i is not None])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ingest gear for the tracked characters concurrently.')
+    parser.add_argument('--http2', action='store_true', help='Fetch over multiplexed HTTP/2 connections (needs the http2 extra)')
+    parser.add_argument('--enrich', action='store_true', help='Also fetch every linked profile sub-resource (implies --http2)')
+    profiling.add_argument(parser)
+    args = parser.parse_args()
+
+    with logging_redirect_tqdm(), profiling.profiled('async_ingest', args.profile, all_threads=True):
+        asyncio.run(main(http2=args.http2, enrich=args.enrich))
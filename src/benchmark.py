@@ -0,0 +1,441 @@
+import argparse
+import io
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, text
+
+from data_models import CharacterProgress, WoWCharacter, init_db
+import analytics
+import async_ingest
+import chart_render
+import database
+import http_client
+import item_level
+import json_codec
+import main as ingest
+import sql_commands as sql
+import synthetic
+import weeks
+import wow_api_models as wow
+
+log = logging.getLogger(__name__)
+
+BENCH_DIR = Path(__file__).resolve().parent.parent / 'benchmarks'
+BASELINE_FILE = Path(BENCH_DIR, 'baseline.json')
+# A result this much worse than its baseline fails the run. Suites whose
+# runs are short or touch the disk and network jitter more between runs
+# on the same machine, so they get more room.
+THRESHOLDS = {'decode': 0.25, 'rollup': 0.25, 'chart': 0.5, 'replay': 0.5, 'db': 0.5}
+REPEAT = 10
+
+# Offline sizes: profiles decoded, (characters, days) for the weekly
+# rollup, and days of history on a chart.
+DECODE_SIZES = {'small': 100, 'medium': 1_000, 'large': 10_000}
+ROLLUP_SIZES = {'small': (100, 90), 'medium': (1_000, 180), 'large': (5_000, 365)}
+CHART_SIZES = {'small': 30, 'medium': 365, 'large': 1_095}
+# Database sizes, as (characters, days) loaded by `synthetic.generate`.
+DB_SIZES = {'small': (100, 60), 'medium': (1_000, 180), 'large': (5_000, 365)}
+# Characters pushed through the ingest path per database size.
+INGEST_SAMPLE = 200
+# Simulated API round trips for the replay suite, in ms.
+REPLAY_LATENCIES = {'instant': 0, 'api': 50}
+
+DB_TABLES = ('gear_event', 'annotation', 'gear_log', 'ilvl_summary', 'progress_log', 'wow_character')
+
+
+@dataclass
+class Result:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool = False
+
+
+def timed(fn: Callable[[], Any], repeat: int = REPEAT) -> float:
+    """Best wall time of `fn` in seconds, after one warm-up call.
+
+    Noise from the rest of the machine only ever adds time, so the minimum
+    is the most repeatable estimate of what the code itself costs.
+    """
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return min(samples)
+
+
+# Locales the API returns for a request made without `locale`.
+ALL_LOCALES = (
+    'en_US', 'es_MX', 'pt_BR', 'de_DE', 'en_GB', 'es_ES', 'fr_FR',
+    'it_IT', 'ru_RU', 'ko_KR', 'zh_TW', 'zh_CN',
+)
+
+
+def all_locales(payload: Any) -> Any:
+    """`payload` as served without `locale`: every name is a dict of translations."""
+    if isinstance(payload, list):
+        return [all_locales(value) for value in payload]
+    if isinstance(payload, dict):
+        return {
+            key: {locale: value for locale in ALL_LOCALES} if key in ('name', 'display_string') and isinstance(value, str)
+            else all_locales(value)
+            for key, value in payload.items()
+        }
+    return payload
+
+
+# Payloads shaped like the profile and equipment endpoints (locale=en_US).
+def profile_payload(index: int) -> Dict[str, Any]:
+    return {
+        '_links': {'self': {'href': f'https://us.api.blizzard.com/profile/wow/character/icecrown/bench{index}'}},
+        'id': 100_000 + index,
+        'name': f'Bench{index}',
+        'gender': {'type': 'FEMALE', 'name': 'Female'},
+        'faction': {'type': 'ALLIANCE', 'name': 'Alliance'},
+        'race': {'key': {'href': 'https://us.api.blizzard.com/data/wow/playable-race/7'}, 'name': 'Gnome', 'id': 7},
+        'character_class': {'key': {'href': 'https://us.api.blizzard.com/data/wow/playable-class/8'}, 'name': 'Mage', 'id': 8},
+        'active_spec': {'key': {'href': 'https://us.api.blizzard.com/data/wow/playable-specialization/63'}, 'name': 'Fire', 'id': 63},
+        'realm': {'key': {'href': 'https://us.api.blizzard.com/data/wow/realm/104'}, 'name': 'Icecrown', 'id': 104, 'slug': 'icecrown'},
+        'level': 80,
+        'experience': 0,
+        'achievement_points': 12_345,
+        'last_login_timestamp': 1_729_000_000_000,
+        'average_item_level': 600,
+        'equipped_item_level': 598,
+        'equipment': {'href': f'https://us.api.blizzard.com/profile/wow/character/icecrown/bench{index}/equipment'},
+        'media': {'href': f'https://us.api.blizzard.com/profile/wow/character/icecrown/bench{index}/character-media'},
+    }
+
+
+def equipment_payload(index: int, ilevel: int = 600) -> Dict[str, Any]:
+    items = []
+    for i, slot in enumerate(item_level.EQUIPPED_SLOTS):
+        if slot == 'OFF_HAND' and index % 3 == 0:
+            continue
+        item_id = 200_000 + index * 100 + i
+        two_handed = slot == 'MAIN_HAND' and index % 3 == 0
+        items.append({
+            'item': {'key': {'href': f'https://us.api.blizzard.com/data/wow/item/{item_id}'}, 'id': item_id},
+            'slot': {'type': slot, 'name': slot.replace('_', ' ').title()},
+            'quantity': 1,
+            'quality': {'type': 'EPIC', 'name': 'Epic'},
+            'name': f'Bench {slot.title()} {item_id}',
+            'inventory_type': {
+                'type': 'TWOHWEAPON' if two_handed else 'WEAPON',
+                'name': 'Two-Hand' if two_handed else 'One-Hand',
+            },
+            'level': {'value': ilevel + (index + i) % 7, 'display_string': f'Item Level {ilevel}'},
+            'stats': [
+                {'type': {'type': stat, 'name': stat.title()}, 'value': 500 + i, 'display': {'display_string': f'+{500 + i} {stat.title()}'}}
+                for stat in ('INTELLECT', 'STAMINA', 'CRIT_RATING', 'HASTE_RATING')
+            ],
+        })
+    return {'character': {'name': f'Bench{index}', 'id': 100_000 + index}, 'equipped_items': items}
+
+
+def bench_decode() -> List[Result]:
+    """Decode profile and equipment payloads the way `main()` does, per profile."""
+    results = []
+    for size, count in DECODE_SIZES.items():
+        payloads = [
+            (json.dumps(profile_payload(i)).encode(), json.dumps(equipment_payload(i)).encode())
+            for i in range(count)
+        ]
+
+        def decode():
+            for profile, equipment in payloads:
+                summary = wow.CharacterProfileSummary(region='us', realm='icecrown', character_name='bench')
+                summary.load(json_codec.loads(profile))
+                ingest.structure_gear({'equipped_items': json_codec.equipped_items(equipment)})
+
+        seconds = timed(decode, repeat=5)
+        results.append(Result(f'decode/{size}', seconds / count * 1e6, 'us/profile'))
+
+    # Equipment alone, full decode vs. extracting `equipped_items`.
+    count = DECODE_SIZES['medium']
+    equipment = [json.dumps(equipment_payload(i)).encode() for i in range(count)]
+    seconds = timed(lambda: [json.loads(payload) for payload in equipment], repeat=5)
+    results.append(Result('decode/equipment_stdlib', seconds / count * 1e6, 'us/profile'))
+    seconds = timed(lambda: [json_codec.equipped_items(payload) for payload in equipment], repeat=5)
+    results.append(Result('decode/equipment_extract', seconds / count * 1e6, 'us/profile'))
+
+    # The same profiles fetched without a locale, for comparison.
+    count = DECODE_SIZES['medium']
+    payloads = [
+        (json.dumps(all_locales(profile_payload(i))).encode(), json.dumps(all_locales(equipment_payload(i))).encode())
+        for i in range(count)
+    ]
+
+    def decode_all_locales():
+        for profile, equipment in payloads:
+            summary = wow.CharacterProfileSummary(region='us', realm='icecrown', character_name='bench')
+            summary.load(json_codec.loads(profile))
+            ingest.structure_gear({'equipped_items': json_codec.equipped_items(equipment)})
+
+    seconds = timed(decode_all_locales, repeat=5)
+    results.append(Result('decode/all_locales', seconds / count * 1e6, 'us/profile'))
+    single_locale = sum(len(json.dumps(profile_payload(i))) + len(json.dumps(equipment_payload(i))) for i in range(count))
+    results.append(Result('decode/bytes', single_locale / count, 'bytes/profile'))
+    results.append(Result('decode/all_locales_bytes', sum(len(p) + len(e) for p, e in payloads) / count, 'bytes/profile'))
+    return results
+
+
+def fixture_characters(path: Path) -> List[str]:
+    """Character keys with a recorded profile response in the fixture archive."""
+    keys = []
+    for key in http_client.load_archive(path):
+        method, url = key.split(' ')[:2]
+        parts = urlsplit(url)
+        segments = parts.path.strip('/').split('/')
+        if method == 'GET' and segments[:3] == ['profile', 'wow', 'character'] and len(segments) == 5:
+            region = (parts.hostname or '').split('.')[0]
+            keys.append(f'{region}|{segments[3]}|{segments[4]}')
+    return keys
+
+
+def bench_replay() -> List[Result]:
+    """The full fetch path (realm, profile, equipment, decode) served from recorded fixtures."""
+    characters = fixture_characters(http_client.FIXTURES_PATH)
+    if not characters:
+        log.warning(f'No recorded characters in {http_client.FIXTURES_PATH}; record some with HTTP_FIXTURES_MODE=record')
+        return []
+
+    results = []
+    for name, latency_ms in REPLAY_LATENCIES.items():
+        http_client.configure('replay', http_client.FIXTURES_PATH, latency_ms)
+
+        def fetch():
+            for key in characters:
+                _, equipment = async_ingest.fetch_character(key, http_client.REDACTED)
+                ingest.structure_gear(equipment)
+
+        seconds = timed(fetch, repeat=5)
+        results.append(Result(f'replay/{name}', seconds / len(characters) * 1e3, 'ms/char'))
+    return results
+
+
+def rollup_frames(characters: int, days: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    ids = np.repeat(np.arange(characters, dtype=np.int32), days)
+    dates = np.tile(
+        np.arange(np.datetime64('2024-09-10'), np.datetime64('2024-09-10') + np.timedelta64(days, 'D')),
+        characters
+    ).astype('datetime64[ns]')
+    progress = pd.DataFrame({
+        'character_id': ids,
+        'record_date': dates,
+        'average_item_level': rng.integers(550, 640, size=ids.size, dtype=np.int16),
+        'pinnacle_quest_done': rng.random(ids.size) < 1 / 7,
+        'profession_1_quest_done': rng.random(ids.size) < 1 / 7,
+        'profession_2_quest_done': rng.random(ids.size) < 1 / 7,
+        'delves_completed': rng.poisson(0.6, size=ids.size).astype(np.int32),
+    })
+    item_levels = progress[['character_id', 'record_date', 'average_item_level']]
+    return progress, item_levels
+
+
+def bench_rollup() -> List[Result]:
+    results = []
+    for size, (characters, days) in ROLLUP_SIZES.items():
+        progress, item_levels = rollup_frames(characters, days)
+
+        seconds = timed(lambda: analytics.completion_rates(analytics.weekly_report(progress, item_levels)))
+        results.append(Result(f'rollup/{size}', seconds * 1e3, 'ms'))
+    return results
+
+
+def bench_chart() -> List[Result]:
+    results = []
+    for size, days in CHART_SIZES.items():
+        start = date(2024, 9, 10)
+        history = [(start + timedelta(days=d), 580 + d // 14) for d in range(days)]
+        annotations = [(start + timedelta(days=d), f'Event {d}') for d in range(0, days, 60)]
+
+        def prepare():
+            fig = chart_render.draw_chart(history, annotations)
+            fig.savefig(io.BytesIO(), format=chart_render.CHART_FORMAT)
+
+        seconds = timed(prepare)
+        results.append(Result(f'chart/{size}', seconds * 1e3, 'ms'))
+    return results
+
+
+def reset_database():
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        init_db(conn)
+        conn.execute(text(f"TRUNCATE {', '.join(DB_TABLES)} RESTART IDENTITY CASCADE"))
+
+
+def bench_database() -> List[Result]:
+    """Ingest, rollup and dashboard queries against a freshly loaded database."""
+    today = date.today()
+    results = []
+    for size, (characters, days) in DB_SIZES.items():
+        log.info(f'Loading {characters} characters x {days} days for db/{size}')
+        reset_database()
+        synthetic.generate(characters, days, seed=0, prefix='bench', start=today - timedelta(days=days))
+
+        with database.get_session() as s:
+            sample = s.scalars(
+                select(WoWCharacter.id).order_by(WoWCharacter.id).limit(INGEST_SAMPLE)
+            ).all()
+
+        payloads = [json.dumps(equipment_payload(i, ilevel=620)).encode() for i in range(len(sample))]
+
+        # Today's ingest on top of the synthetic history: decode, diff
+        # against yesterday, write gear, summary and progress.
+        start = time.perf_counter()
+        for character_id, payload in zip(sample, payloads):
+            with database.get_session() as s:
+                character = s.get(WoWCharacter, character_id)
+                ingest.record_gear(s, character, ingest.structure_gear(json.loads(payload)), today)
+        elapsed = time.perf_counter() - start
+        results.append(Result(f'db/{size}/ingest', len(sample) / elapsed, 'chars/s', higher_is_better=True))
+
+        def progress_rollup():
+            for character_id in sample[:20]:
+                with database.get_session() as s:
+                    CharacterProgress.new(s.get(WoWCharacter, character_id), s)
+
+        seconds = timed(progress_rollup, repeat=5)
+        results.append(Result(f'db/{size}/progress_rollup', seconds / min(len(sample), 20) * 1e3, 'ms/char'))
+
+        overview = text(sql.roster_overview_sql).bindparams(
+            week_start=weeks.reset_week_start(today),
+            week_ago=today - timedelta(days=7),
+            history_since=today - timedelta(days=14),
+        )
+
+        def roster_overview():
+            with database.get_session() as s:
+                s.execute(overview).all()
+
+        results.append(Result(f'db/{size}/roster_overview', timed(roster_overview) * 1e3, 'ms'))
+
+        def chart_history():
+            with database.get_session() as s:
+                for character_id in sample[:20]:
+                    s.execute(
+                        text(sql.daily_ilvl_sql).bindparams(character_id=character_id, since=today - timedelta(days=days))
+                    ).all()
+
+        seconds = timed(chart_history)
+        results.append(Result(f'db/{size}/chart_history', seconds / min(len(sample), 20) * 1e3, 'ms/char'))
+
+    return results
+
+
+SUITES: Dict[str, Callable[[], List[Result]]] = {
+    'decode': bench_decode,
+    'rollup': bench_rollup,
+    'chart': bench_chart,
+    'replay': bench_replay,
+    'db': bench_database,
+}
+# db is left out since it truncates a database; replay skips itself when
+# there is no fixture archive.
+DEFAULT_SUITES = ('decode', 'rollup', 'chart', 'replay')
+
+
+def threshold_for(result: Result) -> float:
+    return THRESHOLDS[result.name.split('/', 1)[0]]
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> Dict[str, Dict[str, Any]]:
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
+
+
+def compare(
+    results: List[Result],
+    baseline: Dict[str, Dict[str, Any]],
+    threshold: Optional[float] = None,
+) -> Tuple[List[str], List[str]]:
+    """Print each result against its baseline; returns the names that regressed and those with no baseline.
+
+    `threshold` applies to every result; by default each suite uses its
+    entry in THRESHOLDS.
+    """
+    regressions = []
+    missing = []
+    for result in results:
+        base = baseline.get(result.name)
+        if base is None:
+            print(f'{result.name:32} {result.value:12.2f} {result.unit:10} NO BASELINE')
+            missing.append(result.name)
+            continue
+
+        change = (result.value - base['value']) / base['value']
+        if result.higher_is_better:
+            change = -change
+        flag = ''
+        if change > (threshold if threshold is not None else threshold_for(result)):
+            flag = '  REGRESSION'
+            regressions.append(result.name)
+        print(f'{result.name:32} {result.value:12.2f} {result.unit:10} baseline {base["value"]:10.2f} ({change:+.0%}){flag}')
+
+    return regressions, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmarks for ingestion, decoding, rollups and dashboard queries.')
+    parser.add_argument('suites', nargs='*', help=f'Suites to run, from {", ".join(SUITES)} (default: {", ".join(DEFAULT_SUITES)})')
+    parser.add_argument('--threshold', type=float, help='Allowed slowdown before failing, as a fraction (default: per suite)')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_FILE)
+    parser.add_argument('--update', action='store_true', help='Store these results as the new baseline')
+    args = parser.parse_args()
+
+    suites = args.suites or list(DEFAULT_SUITES)
+    unknown = set(suites) - SUITES.keys()
+    if unknown:
+        parser.error(f'unknown suites: {", ".join(sorted(unknown))}')
+    if 'db' in suites:
+        # The db suite truncates every table, so it only ever runs against
+        # a database set aside for it.
+        if not os.getenv('BENCH_DB_URL'):
+            parser.error('the db suite needs BENCH_DB_URL pointing at a scratch database')
+        os.environ['DB_URL'] = os.environ['BENCH_DB_URL']
+
+    results = []
+    for name in suites:
+        log.info(f'Running {name}')
+        results.extend(SUITES[name]())
+
+    baseline = load_baseline(args.baseline)
+    regressions, missing = compare(results, baseline, args.threshold)
+
+    if args.update:
+        baseline.update({result.name: asdict(result) for result in results})
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+        log.info(f'Updated {len(results)} baselines in {args.baseline}')
+        return
+
+    if missing:
+        # A result with nothing to compare against can't pass the check;
+        # record it with --update on the reference machine.
+        log.error(f'{len(missing)} results have no baseline in {args.baseline}: {", ".join(missing)}')
+    if regressions:
+        log.error(f'{len(regressions)} regressions: {", ".join(regressions)}')
+    if missing or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
@@ -0,0 +1,170 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from itertools import groupby
+import hashlib
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+import logging
+import os
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.dates import DateFormatter, WeekdayLocator  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+import pandas as pd  # noqa: E402
+from sqlalchemy import or_, select  # noqa: E402
+
+from data_models import Annotation  # noqa: E402
+import database  # noqa: E402
+from streaming import stream_ilvl_history  # noqa: E402
+
+log = logging.getLogger(__name__)
+
+CHART_DIR = Path(os.getenv("CHART_DIR", Path('.', 'storage', 'charts')))
+CHART_FORMAT = 'png'
+HISTORY_DAYS = 30
+
+
+def chart_path(
+    character_id: int,
+    history: Sequence[Tuple[date, int]],
+    annotations: Sequence[Tuple[date, str]] = (),
+) -> Path:
+    """Where the chart of `history` for `character_id` is stored.
+
+    The points and annotations drawn on it are part of the key, so a
+    backfilled day or a new annotation makes the old file stale rather
+    than wrong.
+    """
+    drawn = (
+        [(record_date.isoformat(), int(ilvl)) for record_date, ilvl in history],
+        [(event_date.isoformat(), event) for event_date, event in annotations],
+    )
+    digest = hashlib.sha1(repr(drawn).encode()).hexdigest()[:8]
+    return Path(CHART_DIR, str(character_id), f'{history[-1][0].isoformat()}-{digest}.{CHART_FORMAT}')
+
+
+def draw_chart(history: Sequence[Tuple[date, int]], annotations: Iterable[Tuple[date, str]]) -> Figure:
+    """Draw the item level history with annotation markers.
+
+    Uses a bare `Figure` rather than `pyplot`, so nothing is kept alive in
+    pyplot's global figure registry once the caller drops it.
+    """
+    final_df = pd.DataFrame(
+        history,
+        columns=['d_record_date', 'average_ilevel']
+    )
+
+    min_ilevel = final_df['average_ilevel'].min()
+    max_ilevel = final_df['average_ilevel'].max()
+
+    early = final_df['d_record_date'].min()
+    late = final_df['d_record_date'].max()
+
+    fig = Figure()
+    ax = fig.subplots()
+
+    # Plot the line chart
+    ax.plot(
+        'd_record_date',
+        'average_ilevel',
+        data=final_df,
+        marker='o'
+    )
+
+    for x_coord, event in annotations:
+        ax.axvline(x=x_coord, color="black", linestyle="--")  # type: ignore
+        ax.annotate(event, xy=(x_coord, max_ilevel+8))  # type: ignore
+
+    ax.xaxis.set_major_locator(WeekdayLocator(byweekday=1, interval=1))
+    ax.xaxis.set_major_formatter(DateFormatter('%d %b'))
+
+    # Set x-axis limits
+    ax.set_ylim(min_ilevel - 10, max_ilevel + 10)
+    ax.set_xlim(early, late)
+
+    return fig
+
+
+def render_chart(
+    character_id: int,
+    history: Sequence[Tuple[date, int]],
+    annotations: Iterable[Tuple[date, str]],
+) -> Path:
+    """Render and store the chart for `character_id`, keyed by what it draws.
+
+    Any older chart for the character is removed once the new one is in
+    place, so the directory holds one file per character.
+    """
+    annotations = list(annotations)
+    path = chart_path(character_id, history, annotations)
+    if path.exists():
+        return path
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig = draw_chart(history, annotations)
+    # Write to a temp file first so a reader never sees a half-written chart.
+    tmp = path.with_suffix(f'.{os.getpid()}.tmp')
+    fig.savefig(tmp, format=CHART_FORMAT)
+    tmp.replace(path)
+
+    for old in path.parent.glob(f'*.{CHART_FORMAT}'):
+        if old != path:
+            old.unlink(missing_ok=True)
+
+    return path
+
+
+def _render_worker(args: Tuple[int, Sequence[Tuple[date, int]], List[Tuple[date, str]]]) -> Optional[Path]:
+    try:
+        return render_chart(*args)
+    except Exception as e:
+        log.error(f'Could not render chart for character {args[0]}: {e}')
+        return None
+
+
+def render_all(
+    character_ids: Optional[Iterable[int]] = None,
+    workers: Optional[int] = None,
+    count: int = HISTORY_DAYS,
+) -> int:
+    """Pre-render charts after ingestion. Returns how many charts were written.
+
+    History is read in one streamed query; rendering happens in a process
+    pool so it neither blocks nor bloats the process that called it.
+    """
+    wanted = set(character_ids) if character_ids is not None else None
+    if wanted is not None and not wanted:
+        return 0
+    since = date.today() - timedelta(days=count)
+
+    jobs = []
+    with database.get_session() as s:
+        stmt = (
+            select(Annotation.character_id, Annotation.event_date, Annotation.event)
+            .where(Annotation.event_date >= since)
+            .order_by(Annotation.event_date)
+        )
+        if wanted is not None:
+            stmt = stmt.where(or_(Annotation.character_id.is_(None), Annotation.character_id.in_(wanted)))
+        all_annotations = s.execute(stmt).tuples().all()
+
+        rows = stream_ilvl_history(s, since=since, character_ids=wanted)
+        for character_id, group in groupby(rows, key=lambda row: row.character_id):
+            history = [(row.record_date, row.average_item_level) for row in group]
+            annotations = [
+                (event_date, event)
+                for owner, event_date, event in all_annotations
+                if (owner is None or owner == character_id) and history[0][0] <= event_date <= history[-1][0]
+            ]
+            if not chart_path(character_id, history, annotations).exists():
+                jobs.append((character_id, history, annotations))
+
+    if not jobs:
+        return 0
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=database.dispose_engines) as pool:
+        rendered = [path for path in pool.map(_render_worker, jobs, chunksize=16) if path is not None]
+
+    log.info(f'Rendered {len(rendered)} charts.')
+    return len(rendered)
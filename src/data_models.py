@@ -6,8 +6,10 @@ from sqlalchemy import String as SQL_String
 from sqlalchemy import Integer as SQL_Integer
 from sqlalchemy import Date as SQL_Date
 from sqlalchemy import CheckConstraint
+from sqlalchemy import UniqueConstraint
+from sqlalchemy import Index
 from sqlalchemy import Boolean as SQL_Boolean
-from sqlalchemy import select
+from sqlalchemy import Connection, select, text
 from sqlalchemy.orm import Session
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.orm import Mapped
@@ -15,6 +17,9 @@ from sqlalchemy.orm import mapped_column
 from sqlalchemy.orm import relationship
 import logging
 
+import sql_commands as sql
+from weeks import reset_week_start
+
 logging.addLevelName(5, 'TRACE')
 
 class Base(DeclarativeBase):
@@ -42,6 +47,12 @@ class Base(DeclarativeBase):
 
 class WoWCharacter(Base):
     __tablename__ = "wow_character"
+    __table_args__ = (
+        Index('ix_wow_character_name_id', 'name', 'id'),
+        # Prefix search on lower(name) / lower(realm), see roster.py.
+        Index('ix_wow_character_name_pattern', text('lower(name) text_pattern_ops')),
+        Index('ix_wow_character_realm_pattern', text('lower(realm) text_pattern_ops')),
+    )
 
     region_contraint: CheckConstraint = CheckConstraint(
         "region in ('us', 'eu', 'kr', 'tw')",
@@ -177,6 +188,9 @@ class WoWCharacter(Base):
 
 class GearLog(Base):
     __tablename__ = "gear_log"
+    __table_args__ = (
+        Index('ix_gear_log_character_date', 'character_id', 'record_date'),
+    )
 
     wow_slot_constraint: CheckConstraint = CheckConstraint(
         "slot in ('head', 'neck', 'shoulder', 'chest', 'waist', 'legs', 'feet', 'wrist', 'hands', 'finger_1', 'finger_2', 'trinket_1', 'trinket_2','back', 'main_hand', 'off_hand')",
@@ -204,7 +218,71 @@ class GearLog(Base):
 
     def __repr__(self) -> str:
         return f"GearLog(id={self.id}, character={self.character_id}, date={self.record_date})"
-    
+
+class ItemLevelSummary(Base):
+    __tablename__ = "ilvl_summary"
+    __table_args__ = (
+        UniqueConstraint('character_id', 'record_date', name='ilvl_summary_character_date'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    character_id: Mapped[int] = mapped_column(ForeignKey('wow_character.id'), index=True)
+    wow_character: Mapped["WoWCharacter"] = relationship(WoWCharacter)
+    record_date: Mapped[date] = mapped_column(SQL_Date)
+    average_item_level: Mapped[int] = mapped_column(SQL_Integer)
+    total_item_level: Mapped[int] = mapped_column(SQL_Integer)
+    slots_equipped: Mapped[int] = mapped_column(SQL_Integer)
+
+    def __init__(self, **kw: Any):
+        super().__init__(**kw)
+
+    def __repr__(self) -> str:
+        return f"ItemLevelSummary(character={self.character_id}, date={self.record_date}, ilvl={self.average_item_level})"
+
+class GearEvent(Base):
+    __tablename__ = "gear_event"
+    __table_args__ = (
+        Index('ix_gear_event_character_date', 'character_id', 'record_date'),
+        Index('ix_gear_event_date', 'record_date'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    character_id: Mapped[int] = mapped_column(ForeignKey('wow_character.id'))
+    wow_character: Mapped["WoWCharacter"] = relationship(WoWCharacter)
+    record_date: Mapped[date] = mapped_column(SQL_Date)
+    slot: Mapped[str] = mapped_column(SQL_String)
+    old_item_id: Mapped[Optional[int]] = mapped_column(SQL_Integer, nullable=True)
+    new_item_id: Mapped[Optional[int]] = mapped_column(SQL_Integer, nullable=True)
+    old_ilevel: Mapped[Optional[int]] = mapped_column(SQL_Integer, nullable=True)
+    new_ilevel: Mapped[Optional[int]] = mapped_column(SQL_Integer, nullable=True)
+    old_name: Mapped[Optional[str]] = mapped_column(SQL_String, nullable=True)
+    new_name: Mapped[Optional[str]] = mapped_column(SQL_String, nullable=True)
+
+    def __init__(self, **kw: Any):
+        super().__init__(**kw)
+
+    def __repr__(self) -> str:
+        return f"GearEvent(character={self.character_id}, date={self.record_date}, slot={self.slot}, {self.old_ilevel} -> {self.new_ilevel})"
+
+class Annotation(Base):
+    __tablename__ = "annotation"
+    __table_args__ = (
+        Index('ix_annotation_date', 'event_date'),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    # NULL means the annotation applies to every character.
+    character_id: Mapped[Optional[int]] = mapped_column(ForeignKey('wow_character.id'), nullable=True)
+    wow_character: Mapped[Optional["WoWCharacter"]] = relationship(WoWCharacter)
+    event_date: Mapped[date] = mapped_column(SQL_Date)
+    event: Mapped[str] = mapped_column(SQL_String)
+
+    def __init__(self, **kw: Any):
+        super().__init__(**kw)
+
+    def __repr__(self) -> str:
+        return f"Annotation(id={self.id}, character={self.character_id}, date={self.event_date}, event={self.event!r})"
+
 class CharacterProgress(Base):
     __tablename__ = "progress_log"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -273,18 +351,16 @@ class CharacterProgress(Base):
         profession_2_quest_done = False
         delves_completed = 0
         
-        for d in range(1,7):
-            target_date = date.today() - timedelta(days=d)
-            if target_date.weekday() != 1:
-                this_wow_week.append(target_date)
+        week_start = reset_week_start(date.today())
+        for d in range(1, (date.today() - week_start).days + 1):
+            this_wow_week.append(date.today() - timedelta(days=d))
 
         with session as s:
-            latest_gear_logs = s.scalars(
-                select(GearLog)
-                .where(GearLog.character_id == character.id)
-                .where(GearLog.record_date == date.today())
-            )
-            average_item_level = int(sum([glog.ilevel for glog in latest_gear_logs]) / 16)
+            average_item_level = s.scalar(
+                select(ItemLevelSummary.average_item_level)
+                .where(ItemLevelSummary.character_id == character.id)
+                .where(ItemLevelSummary.record_date == date.today())
+            ) or 0
 
             for day in sorted(this_wow_week):
                 prog = s.scalar(
@@ -316,5 +392,68 @@ class CharacterProgress(Base):
 
             return current_progress
 
+    @staticmethod
+    def record(session: Session, character_id: int, record_date: date, **values: Any) -> bool:
+        """Set `values` on the progress row for `character_id` on `record_date`.
+
+        Only touches the database when something actually changed. Returns
+        whether a write happened.
+        """
+        progress = session.scalar(
+            select(CharacterProgress)
+            .where(CharacterProgress.character_id == character_id)
+            .where(CharacterProgress.record_date == record_date)
+            .order_by(CharacterProgress.id.desc())
+            .limit(1)
+        )
+
+        if progress is None:
+            average_item_level = session.scalar(
+                select(ItemLevelSummary.average_item_level)
+                .where(ItemLevelSummary.character_id == character_id)
+                .where(ItemLevelSummary.record_date <= record_date)
+                .order_by(ItemLevelSummary.record_date.desc())
+                .limit(1)
+            ) or 0
+            progress = CharacterProgress(
+                character_id=character_id,
+                record_date=record_date,
+                average_item_level=average_item_level,
+                **values
+            )
+            session.add(progress)
+            session.commit()
+            return True
+
+        changed = {
+            key: val
+            for key, val in values.items()
+            if getattr(progress, key) != val
+        }
+        if not changed:
+            return False
+
+        progress.update(session=session, **changed)
+        return True
+
     def __repr__(self) -> str:
         return f"CharacterProgress(id={self.id}, character={self.character_id}, date={self.record_date})"
+
+
+def init_db(conn: Connection):
+    """Bring the schema up to date. Safe to run on every startup.
+
+    Creates missing tables and the indexes `create_all` skips on tables
+    that already exist, then summarises any day of gear_log that has no
+    ilvl_summary row yet, i.e. history recorded before summaries were
+    written at ingest. Use as `with engine.begin() as conn: init_db(conn)`.
+    """
+    Base.metadata.create_all(conn)
+    conn.execute(text(sql.create_gear_log_index_sql))
+    conn.execute(text(sql.create_roster_index_sql))
+    conn.execute(text(sql.create_roster_name_search_index_sql))
+    conn.execute(text(sql.create_roster_realm_search_index_sql))
+
+    backfilled = conn.execute(text(sql.backfill_ilvl_summary_sql)).rowcount
+    if backfilled:
+        logging.getLogger(__name__).info(f'Backfilled {backfilled} ilvl_summary rows from gear_log.')
@@ -0,0 +1,144 @@
+from functools import cache
+from typing import Any, Dict, List, Optional
+from sqlalchemy import Engine, create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+_engines: List[Engine | AsyncEngine] = []
+
+# Pool settings, overridable from the environment so ingestion workers,
+# the dashboard and one-off scripts can be tuned without code changes.
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+# psycopg prepares a statement server-side after it has run this many times.
+PREPARE_THRESHOLD = int(os.getenv("DB_PREPARE_THRESHOLD", "5"))
+# SQLAlchemy's compiled statement cache, per engine.
+QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+
+
+def database_url(driver: str = "psycopg") -> str:
+    if os.getenv("DB_URL"):
+        return os.environ["DB_URL"]
+
+    db_host = os.getenv("DB_HOST")
+    db_user = os.getenv("DB_USER")
+    db_port = os.getenv("DB_PORT")
+    db_pass = os.getenv("DB_PASS")
+    db_name = os.getenv("DB_NAME")
+
+    return f"postgresql+{driver}://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}"
+
+
+def connect_args(statement_timeout_ms: int = STATEMENT_TIMEOUT_MS) -> Dict[str, Any]:
+    return {
+        "options": f"-c statement_timeout={statement_timeout_ms}",
+        "prepare_threshold": PREPARE_THRESHOLD,
+    }
+
+
+def get_engine(
+    url: Optional[str] = None,
+    echo: bool = False,
+    pool_size: int = POOL_SIZE,
+    max_overflow: int = MAX_OVERFLOW,
+    statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+) -> Engine:
+    """Return the process-wide engine for `url` (default: from the environment).
+
+    Engines are cached, so every caller in a process shares one pool instead
+    of opening its own connections. Arguments are resolved before the cache
+    lookup, so `get_engine()` and `get_engine(url, echo=False)` for the same
+    database return the same engine.
+    """
+    return _engine(url or database_url(), echo, pool_size, max_overflow, statement_timeout_ms)
+
+
+@cache
+def _engine(url: str, echo: bool, pool_size: int, max_overflow: int, statement_timeout_ms: int) -> Engine:
+    engine = create_engine(
+        url,
+        echo=echo,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args=connect_args(statement_timeout_ms),
+    )
+
+    _engines.append(engine)
+    log.debug(f"Created engine for {engine.url!r} (pool_size={pool_size}, max_overflow={max_overflow})")
+    return engine
+
+
+def get_sessionmaker(url: Optional[str] = None, echo: bool = False) -> sessionmaker[Session]:
+    return _sessionmaker(get_engine(url, echo))
+
+
+@cache
+def _sessionmaker(engine: Engine) -> sessionmaker[Session]:
+    return sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def get_session(url: Optional[str] = None, echo: bool = False) -> Session:
+    return get_sessionmaker(url, echo)()
+
+
+def get_async_engine(
+    url: Optional[str] = None,
+    echo: bool = False,
+    pool_size: int = POOL_SIZE,
+    max_overflow: int = MAX_OVERFLOW,
+    statement_timeout_ms: int = STATEMENT_TIMEOUT_MS,
+) -> AsyncEngine:
+    """Async counterpart of `get_engine`, using psycopg's native async driver."""
+    return _async_engine(url or database_url(), echo, pool_size, max_overflow, statement_timeout_ms)
+
+
+@cache
+def _async_engine(url: str, echo: bool, pool_size: int, max_overflow: int, statement_timeout_ms: int) -> AsyncEngine:
+    engine = create_async_engine(
+        url,
+        echo=echo,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=True,
+        query_cache_size=QUERY_CACHE_SIZE,
+        connect_args=connect_args(statement_timeout_ms),
+    )
+
+    _engines.append(engine)
+    log.debug(f"Created async engine for {engine.url!r} (pool_size={pool_size}, max_overflow={max_overflow})")
+    return engine
+
+
+def get_async_sessionmaker(url: Optional[str] = None, echo: bool = False) -> async_sessionmaker[AsyncSession]:
+    return _async_sessionmaker(get_async_engine(url, echo))
+
+
+@cache
+def _async_sessionmaker(engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=engine, expire_on_commit=False)
+
+
+def dispose_engines(close: bool = False):
+    """Drop pooled connections inherited from a parent process.
+
+    Call this at the start of a forked worker; with `close=False` the
+    parent's connections are left untouched.
+    """
+    for engine in _engines:
+        if isinstance(engine, AsyncEngine):
+            engine.sync_engine.dispose(close=close)
+        else:
+            engine.dispose(close=close)
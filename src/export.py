@@ -0,0 +1,258 @@
+import argparse
+import itertools
+import json
+import logging
+import shutil
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from data_models import CharacterProgress, GearLog, WoWCharacter
+import database
+from streaming import stream
+from weeks import reset_week_start
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.dataset as ds
+except ImportError as e:  # pragma: no cover
+    raise ImportError("Exporting to Parquet needs pyarrow: `uv sync --extra export`") from e
+
+log = logging.getLogger(__name__)
+
+EXPORT_DIR = Path('.', 'storage', 'export')
+STATE_FILE = 'export_state.json'
+# Rows per Arrow record batch (and per round trip from the server-side cursor).
+CHUNK_SIZE = 50_000
+# Explicit Arrow types, so a chunk that happens to be all NULL in some
+# column still matches the dataset schema.
+COLUMN_TYPES = {
+    'id': pa.int32(),
+    'key': pa.string(),
+    'region': pa.string(),
+    'realm': pa.string(),
+    'name': pa.string(),
+    'level': pa.int16(),
+    'character_id': pa.int32(),
+    'record_date': pa.date32(),
+    'slot': pa.string(),
+    'item_id': pa.int32(),
+    'ilevel': pa.int16(),
+    'quality': pa.string(),
+    'size': pa.string(),
+    'character_level': pa.int16(),
+    'average_item_level': pa.int16(),
+    'pinnacle_quest_done': pa.bool_(),
+    'profession_1_quest_done': pa.bool_(),
+    'profession_2_quest_done': pa.bool_(),
+    'delves_completed': pa.int32(),
+}
+# Low-cardinality text columns, stored dictionary-encoded.
+DICTIONARY_COLUMNS = {'slot', 'quality', 'name', 'realm', 'region', 'size'}
+
+
+def gear_log_select(since: Optional[date], until: date) -> Select:
+    stmt = (
+        select(
+            WoWCharacter.region,
+            GearLog.character_id,
+            GearLog.record_date,
+            GearLog.slot,
+            GearLog.item_id,
+            GearLog.ilevel,
+            GearLog.name,
+            GearLog.quality,
+            GearLog.size,
+        )
+        .join(WoWCharacter, WoWCharacter.id == GearLog.character_id)
+        .where(GearLog.record_date < until)
+        .order_by(GearLog.record_date)
+    )
+    if since is not None:
+        stmt = stmt.where(GearLog.record_date >= since)
+    return stmt
+
+
+def progress_log_select(since: Optional[date], until: date) -> Select:
+    stmt = (
+        select(
+            WoWCharacter.region,
+            CharacterProgress.character_id,
+            CharacterProgress.record_date,
+            CharacterProgress.character_level,
+            CharacterProgress.average_item_level,
+            CharacterProgress.pinnacle_quest_done,
+            CharacterProgress.profession_1_quest_done,
+            CharacterProgress.profession_2_quest_done,
+            CharacterProgress.delves_completed,
+        )
+        .join(WoWCharacter, WoWCharacter.id == CharacterProgress.character_id)
+        .where(CharacterProgress.record_date < until)
+        .order_by(CharacterProgress.record_date)
+    )
+    if since is not None:
+        stmt = stmt.where(CharacterProgress.record_date >= since)
+    return stmt
+
+
+def wow_character_select() -> Select:
+    return select(
+        WoWCharacter.id,
+        WoWCharacter.key,
+        WoWCharacter.region,
+        WoWCharacter.realm,
+        WoWCharacter.name,
+        WoWCharacter.level,
+    ).order_by(WoWCharacter.id)
+
+
+HISTORY_TABLES = {
+    'gear_log': gear_log_select,
+    'progress_log': progress_log_select,
+}
+
+
+def to_batches(session: Session, stmt: Select, columns: Sequence[str]) -> Iterator[pa.RecordBatch]:
+    """Stream `stmt` into Arrow record batches of at most CHUNK_SIZE rows."""
+    rows: List[tuple] = []
+    for row in stream(session, stmt, CHUNK_SIZE):
+        rows.append(row)
+        if len(rows) == CHUNK_SIZE:
+            yield _batch(rows, columns)
+            rows = []
+
+    if rows:
+        yield _batch(rows, columns)
+
+
+def _batch(rows: List[tuple], columns: Sequence[str]) -> pa.RecordBatch:
+    arrays = []
+    names = list(columns)
+    for i, column in enumerate(columns):
+        array = pa.array([row[i] for row in rows], type=COLUMN_TYPES[column])
+        if column in DICTIONARY_COLUMNS:
+            array = array.dictionary_encode()
+        arrays.append(array)
+
+    if 'record_date' in names:
+        dates = pc.cast(arrays[names.index('record_date')], pa.timestamp('s'))
+        names.append('month')
+        arrays.append(pc.strftime(dates, format='%Y-%m').dictionary_encode())
+
+    return pa.RecordBatch.from_arrays(arrays, names=names)
+
+
+def _write(
+    batches: Iterator[pa.RecordBatch],
+    target: Path,
+    partitioning: List[str],
+) -> Optional[date]:
+    """Write `batches` as a Parquet dataset; returns the newest record_date written."""
+    first = next(batches, None)
+    if first is None:
+        return None
+
+    last: Optional[date] = None
+
+    def all_batches():
+        nonlocal last
+        for batch in itertools.chain([first], batches):
+            if 'record_date' in batch.schema.names:
+                batch_max = pc.max(batch.column('record_date')).as_py()
+                last = batch_max if last is None else max(last, batch_max)
+            yield batch
+
+    ds.write_dataset(
+        all_batches(),
+        target,
+        schema=first.schema,
+        format='parquet',
+        partitioning=partitioning,
+        partitioning_flavor='hive',
+        basename_template=f'part-{uuid.uuid4().hex}-{{i}}.parquet',
+        # delete_matching clears each partition this run writes to before
+        # writing it, so `batches` must hold every row of those partitions.
+        existing_data_behavior='delete_matching',
+    )
+
+    return last
+
+
+def load_state(out_dir: Path) -> Dict[str, str]:
+    path = Path(out_dir, STATE_FILE)
+    if path.exists():
+        return json.loads(path.read_text())
+    return {}
+
+
+def rewrite_from(last_exported: date, today: date) -> date:
+    """First date an incremental export rewrites.
+
+    Progress for the current reset week is still edited from the dashboard,
+    so that week is exported again as well as anything newer than the last
+    run. Month partitions are replaced whole, so this is the first of the
+    month holding whichever of the two comes first.
+    """
+    earliest = min(last_exported + timedelta(days=1), reset_week_start(today))
+    return earliest.replace(day=1)
+
+
+def export(out_dir: Path = EXPORT_DIR, incremental: bool = False):
+    """Export history to Parquet, partitioned by region and month.
+
+    In incremental mode the months from `rewrite_from` on are rewritten;
+    otherwise the export is rebuilt from scratch. Today is left out either
+    way, since ingestion may still be writing it.
+    """
+    today = date.today()
+    state = load_state(out_dir) if incremental else {}
+    if not incremental and out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+
+    with database.get_session() as s:
+        for table, build_select in HISTORY_TABLES.items():
+            since = None
+            if table in state:
+                since = rewrite_from(date.fromisoformat(state[table]), today)
+
+            stmt = build_select(since, today)
+            columns = [c.name for c in stmt.selected_columns]
+            last = _write(to_batches(s, stmt, columns), Path(out_dir, table), ['region', 'month'])
+            if last is not None:
+                state[table] = last.isoformat()
+            log.info(f'Exported {table} since {since or "the beginning"}')
+
+        # The roster is small and mutable, so it is always rewritten. It is
+        # written beside the old copy and swapped in, so a region that no
+        # longer has characters doesn't keep a stale partition.
+        stmt = wow_character_select()
+        columns = [c.name for c in stmt.selected_columns]
+        target = Path(out_dir, 'wow_character')
+        staging = Path(out_dir, f'.wow_character-{uuid.uuid4().hex}')
+        _write(to_batches(s, stmt, columns), staging, ['region'])
+        if target.exists():
+            shutil.rmtree(target)
+        if staging.exists():
+            staging.replace(target)
+
+    Path(out_dir, STATE_FILE).write_text(json.dumps(state, indent=2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export tracker history to partitioned Parquet.')
+    parser.add_argument('--out', type=Path, default=EXPORT_DIR)
+    parser.add_argument('--incremental', action='store_true', help='Only rewrite months changed since the last export')
+    args = parser.parse_args()
+
+    export(args.out, incremental=args.incremental)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
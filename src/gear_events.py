@@ -0,0 +1,81 @@
+from datetime import date
+from typing import Any, Dict, List, Mapping
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+import logging
+
+from data_models import GearEvent, GearLog, WoWCharacter
+
+log = logging.getLogger(__name__)
+
+Snapshot = Mapping[str, Mapping[str, Any]]
+
+
+def previous_snapshot(session: Session, character_id: int, record_date: date) -> Dict[str, Dict[str, Any]]:
+    """The last stored gear before `record_date`, keyed by slot (empty if none)."""
+    last_date = (
+        select(func.max(GearLog.record_date))
+        .where(GearLog.character_id == character_id)
+        .where(GearLog.record_date < record_date)
+        .scalar_subquery()
+    )
+
+    return {
+        gear.slot: {
+            'name': gear.name,
+            'item_id': gear.item_id,
+            'ilevel': gear.ilevel,
+        }
+        for gear in session.scalars(
+            select(GearLog)
+            .where(GearLog.character_id == character_id)
+            .where(GearLog.record_date == last_date)
+        )
+    }
+
+
+def diff_gear(previous: Snapshot, current: Snapshot) -> List[Dict[str, Any]]:
+    """Slots whose item or item level differs between two snapshots."""
+    changes = []
+    for slot, gear in current.items():
+        old = previous.get(slot, {})
+        if old.get('item_id') == gear['item_id'] and old.get('ilevel') == gear['ilevel']:
+            continue
+
+        changes.append({
+            'slot': slot,
+            'old_item_id': old.get('item_id'),
+            'new_item_id': gear['item_id'],
+            'old_ilevel': old.get('ilevel'),
+            'new_ilevel': gear['ilevel'],
+            'old_name': old.get('name'),
+            'new_name': gear['name'],
+        })
+
+    return changes
+
+
+def record_events(
+    session: Session,
+    character: WoWCharacter,
+    previous: Snapshot,
+    current: Snapshot,
+    record_date: date,
+) -> List[GearEvent]:
+    """Add a `GearEvent` for every changed slot. The caller owns the transaction.
+
+    With no previous snapshot there is nothing to compare against, so a
+    character's first ingest emits no events.
+    """
+    if not previous:
+        return []
+
+    events = [
+        GearEvent(wow_character=character, record_date=record_date, **change)
+        for change in diff_gear(previous, current)
+    ]
+    session.add_all(events)
+
+    if events:
+        log.debug(f'{character.key}: {len(events)} gear changes on {record_date}')
+    return events
@@ -0,0 +1,202 @@
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import BaseAdapter, HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+log = logging.getLogger(__name__)
+
+# HTTP_FIXTURES_MODE: unset for live traffic, 'record' to capture live
+# responses into the archive, 'replay' to serve them with no network.
+FIXTURES_MODE = os.getenv("HTTP_FIXTURES_MODE", "")
+FIXTURES_PATH = Path(os.getenv("HTTP_FIXTURES", Path('.', 'fixtures', 'http.jsonl.gz')))
+# Simulated round trip per replayed response.
+FIXTURE_LATENCY_MS = float(os.getenv("HTTP_FIXTURE_LATENCY_MS", "0"))
+POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+
+REDACTED = 'REDACTED'
+# Response headers worth keeping; everything else is noise in a fixture.
+KEPT_HEADERS = ('Content-Type',)
+_TOKEN_FIELDS = ('access_token', 'id_token', 'refresh_token')
+_BEARER = re.compile(r'Bearer\s+[A-Za-z0-9._~+/=-]+')
+
+
+class FixtureMissingError(requests.ConnectionError):
+    pass
+
+
+def fixture_key(method: str, url: str, body: Optional[bytes | str] = None) -> str:
+    """Identify a request by method, URL (query sorted) and body digest.
+
+    Headers are deliberately left out, so a replay matches whatever token
+    the caller happens to hold.
+    """
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    key = f'{method.upper()} {urlunsplit(parts._replace(query=query))}'
+
+    if body:
+        if isinstance(body, str):
+            body = body.encode()
+        key += f' {hashlib.sha1(body).hexdigest()[:12]}'
+    return key
+
+
+def scrub(body: str) -> str:
+    """Remove OAuth tokens and bearer credentials from a response body."""
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return _BEARER.sub(f'Bearer {REDACTED}', body)
+
+    if isinstance(payload, dict):
+        for field in _TOKEN_FIELDS:
+            if field in payload:
+                payload[field] = REDACTED
+    return _BEARER.sub(f'Bearer {REDACTED}', json.dumps(payload, separators=(',', ':')))
+
+
+def load_archive(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Read a fixture archive; a key recorded more than once keeps its latest response."""
+    fixtures: Dict[str, Dict[str, Any]] = {}
+    if not path.exists():
+        return fixtures
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                entry = json.loads(line)
+                fixtures[entry['key']] = entry
+    return fixtures
+
+
+def _response(request: requests.PreparedRequest, entry: Dict[str, Any]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.reason = entry.get('reason', '')
+    response.headers = CaseInsensitiveDict(entry.get('headers', {}))
+    response._content = entry['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = request.url or ''
+    response.request = request
+    return response
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Send requests for real, appending each response to the archive."""
+
+    def __init__(self, path: Path, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        response = super().send(request, *args, **kwargs)
+
+        entry = {
+            'key': fixture_key(request.method or 'GET', request.url or '', request.body),
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+            'body': scrub(response.text),
+        }
+        line = json.dumps(entry, separators=(',', ':')) + '\n'
+
+        # Each append is its own gzip member; readers see one stream.
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with gzip.open(self.path, 'at', encoding='utf-8') as f:
+                f.write(line)
+
+        return response
+
+
+class ReplayAdapter(BaseAdapter):
+    """Serve responses from a fixture archive without touching the network."""
+
+    def __init__(self, path: Path, latency_ms: float = 0):
+        super().__init__()
+        self.fixtures = load_archive(path)
+        self.latency_ms = latency_ms
+        log.debug(f'Loaded {len(self.fixtures)} fixtures from {path}')
+
+    def send(self, request: requests.PreparedRequest, *args, **kwargs) -> requests.Response:
+        key = fixture_key(request.method or 'GET', request.url or '', request.body)
+        entry = self.fixtures.get(key)
+        if entry is None:
+            raise FixtureMissingError(f'No recorded response for {key}', request=request)
+
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        return _response(request, entry)
+
+    def close(self):
+        pass
+
+
+def build_session(
+    mode: str = FIXTURES_MODE,
+    path: Path = FIXTURES_PATH,
+    latency_ms: float = FIXTURE_LATENCY_MS,
+) -> requests.Session:
+    session = requests.Session()
+
+    if mode == 'record':
+        adapter: BaseAdapter = RecordingAdapter(path, pool_maxsize=POOL_SIZE)
+    elif mode == 'replay':
+        adapter = ReplayAdapter(path, latency_ms)
+    elif mode == '':
+        adapter = HTTPAdapter(pool_maxsize=POOL_SIZE)
+    else:
+        raise ValueError(f"Unknown HTTP_FIXTURES_MODE '{mode}', expected 'record' or 'replay'")
+
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    if mode:
+        log.info(f'HTTP fixtures: {mode} ({path})')
+    return session
+
+
+_session: Optional[requests.Session] = None
+
+
+def get_session() -> requests.Session:
+    """The process-wide HTTP session used by the API client and ingestion.
+
+    Sharing one session keeps connections to the API alive between calls,
+    and is the single place where fixture recording or replay is switched on.
+    """
+    global _session
+    if _session is None:
+        _session = build_session()
+    return _session
+
+
+def configure(mode: str, path: Path = FIXTURES_PATH, latency_ms: float = FIXTURE_LATENCY_MS) -> requests.Session:
+    """Swap the process-wide session, e.g. to replay fixtures from a script."""
+    global _session
+    _session = build_session(mode, path, latency_ms)
+    return _session
+
+
+def get(url: str, params: Optional[Dict[str, Any]] = None, headers: Optional[Dict[str, str]] = None) -> requests.Response:
+    return get_session().get(url, params=params, headers=headers)
+
+
+def post(
+    url: str,
+    data: Optional[Dict[str, Any]] = None,
+    headers: Optional[Dict[str, str]] = None,
+    auth: Optional[Tuple[str, str]] = None,
+) -> requests.Response:
+    return get_session().post(url, data=data, headers=headers, auth=auth)
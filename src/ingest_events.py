@@ -0,0 +1,109 @@
+from datetime import date
+from threading import Lock, Thread
+from typing import Dict, Optional, Tuple
+from sqlalchemy import make_url, text
+from sqlalchemy.orm import Session
+import logging
+import psycopg
+import time
+
+log = logging.getLogger(__name__)
+
+CHANNEL = 'wow_ingest'
+ROSTER = 'roster'
+ANNOTATIONS = 'annotations'
+
+
+def notify_ingested(session: Session, character_id: int, record_date: date):
+    """Queue a notification that `character_id` has new data for `record_date`.
+
+    Postgres only delivers it when the surrounding transaction commits, so
+    listeners never see data that was rolled back.
+    """
+    session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": f"{character_id}|{record_date.isoformat()}"}
+    )
+
+
+def notify_annotations_changed(session: Session):
+    session.execute(
+        text("SELECT pg_notify(:channel, :payload)"),
+        {"channel": CHANNEL, "payload": ANNOTATIONS}
+    )
+
+
+def notify_roster_changed(cur: psycopg.Cursor):
+    """Like `notify_ingested`, on a raw psycopg cursor.
+
+    The roster import runs its COPY and merge on the driver connection, so
+    the notification has to go out in that same transaction.
+    """
+    cur.execute("SELECT pg_notify(%s, %s)", (CHANNEL, ROSTER))
+
+
+class IngestWatcher:
+    """LISTENs for ingestion commits and hands out cache versions.
+
+    Callers fold `version(...)` into their cache keys; when ingestion commits
+    for a character its version changes and the old cache entries are
+    simply never asked for again.
+    """
+    _log: logging.Logger
+    _versions: Dict[int, Tuple[Optional[str], int]]
+    _roster_version: int = 0
+    _annotations_version: int = 0
+    # Bumped on every (re)connect, since notifications sent while we were
+    # disconnected are lost.
+    _epoch: int = 0
+    reconnect_delay: int = 5
+
+    def __init__(self, url: str):
+        self._log = logging.getLogger('IngestWatcher')
+        self._url = make_url(url).set(drivername='postgresql').render_as_string(hide_password=False)
+        self._versions = {}
+        self._lock = Lock()
+
+        self._thread = Thread(target=self._listen, name='ingest-watcher', daemon=True)
+        self._thread.start()
+
+    def version(self, character_id: int) -> Tuple[int, Optional[str], int]:
+        with self._lock:
+            return (self._epoch, *self._versions.get(character_id, (None, 0)))
+
+    @property
+    def roster_version(self) -> Tuple[int, int]:
+        return (self._epoch, self._roster_version)
+
+    @property
+    def annotations_version(self) -> Tuple[int, int]:
+        return (self._epoch, self._annotations_version)
+
+    def _handle(self, payload: str):
+        with self._lock:
+            if payload == ROSTER:
+                self._roster_version += 1
+                return
+            if payload == ANNOTATIONS:
+                self._annotations_version += 1
+                return
+
+            character_id, record_date = payload.split('|')
+            _, counter = self._versions.get(int(character_id), (None, 0))
+            self._versions[int(character_id)] = (record_date, counter + 1)
+            # New characters show up in the roster, too.
+            self._roster_version += 1
+
+    def _listen(self):
+        while True:
+            try:
+                with psycopg.connect(self._url, autocommit=True) as conn:
+                    conn.execute(f"LISTEN {CHANNEL}")
+                    with self._lock:
+                        self._epoch += 1
+                    self._log.debug(f'Listening on {CHANNEL}')
+                    for notify in conn.notifies():
+                        self._handle(notify.payload)
+            except Exception as e:
+                self._log.warning(f'Lost {CHANNEL} listener connection: {e}')
+                time.sleep(self.reconnect_delay)
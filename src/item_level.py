@@ -0,0 +1,95 @@
+from datetime import date
+from typing import Any, Dict, Mapping, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+import logging
+
+from data_models import ItemLevelSummary, WoWCharacter
+
+log = logging.getLogger(__name__)
+
+# Slots that count towards the in-game average item level.
+EQUIPPED_SLOTS = (
+    'HEAD',
+    'NECK',
+    'SHOULDER',
+    'BACK',
+    'CHEST',
+    'WAIST',
+    'HANDS',
+    'WRIST',
+    'LEGS',
+    'FEET',
+    'FINGER_1',
+    'FINGER_2',
+    'TRINKET_1',
+    'TRINKET_2',
+    'MAIN_HAND',
+    'OFF_HAND'
+)
+
+SLOT_COUNT = len(EQUIPPED_SLOTS)
+TWO_HANDED = 'TWOHWEAPON'
+
+
+def total_item_level(gear: Mapping[str, Mapping[str, Any]]) -> int:
+    """Sum the item levels of `gear`, counting a two-hander in both hands.
+
+    `gear` is keyed by slot type, as built by `main()` into `structured_gear`.
+    """
+    total = sum(
+        gear[slot]['ilevel']
+        for slot in EQUIPPED_SLOTS
+        if slot in gear
+    )
+
+    main_hand = gear.get('MAIN_HAND')
+    if main_hand is not None and main_hand.get('size') == TWO_HANDED and 'OFF_HAND' not in gear:
+        total += main_hand['ilevel']
+
+    return total
+
+
+def average_item_level(gear: Mapping[str, Mapping[str, Any]]) -> int:
+    return int(total_item_level(gear) / SLOT_COUNT)
+
+
+def record_summary(
+    session: Session,
+    character: WoWCharacter,
+    gear: Mapping[str, Mapping[str, Any]],
+    record_date: Optional[date] = None,
+) -> ItemLevelSummary:
+    """Write (or refresh) the per-day item level summary for `character`.
+
+    This is the only place the average item level is calculated; the
+    dashboard, the SQL reports and `CharacterProgress` all read the row
+    it writes. The caller owns the transaction.
+    """
+    if record_date is None:
+        record_date = date.today()
+
+    values: Dict[str, Any] = {
+        'total_item_level': total_item_level(gear),
+        'average_item_level': average_item_level(gear),
+        'slots_equipped': len([slot for slot in EQUIPPED_SLOTS if slot in gear]),
+    }
+
+    summary = session.scalar(
+        select(ItemLevelSummary)
+        .where(ItemLevelSummary.character_id == character.id)
+        .where(ItemLevelSummary.record_date == record_date)
+    )
+
+    if summary is None:
+        summary = ItemLevelSummary(
+            wow_character=character,
+            record_date=record_date,
+            **values
+        )
+        session.add(summary)
+    else:
+        summary.update(**values)
+
+    log.debug(f'{character.key} average item level on {record_date}: {values["average_item_level"]}')
+    return summary
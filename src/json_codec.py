@@ -0,0 +1,110 @@
+from typing import Any, Dict, List, Optional
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Optional fast codecs: `uv sync --extra json`. Both are used when present;
+# the stdlib is always there as a fallback.
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # pragma: no cover
+    msgspec = None
+
+# JSON_CODEC: 'auto' picks the fastest installed codec; 'orjson', 'msgspec'
+# or 'json' force one (e.g. 'json' to rule the codec out when debugging).
+JSON_CODEC = os.getenv("JSON_CODEC", "auto")
+CODECS = ('orjson', 'msgspec', 'json')
+
+
+def _available(name: str) -> bool:
+    return {'orjson': orjson, 'msgspec': msgspec, 'json': json}[name] is not None
+
+
+def resolve(name: str = JSON_CODEC) -> str:
+    if name == 'auto':
+        return next(codec for codec in CODECS if _available(codec))
+    if name not in CODECS:
+        raise ValueError(f"Unknown JSON_CODEC '{name}', expected 'auto' or one of {', '.join(CODECS)}")
+    if not _available(name):
+        raise ImportError(f"JSON_CODEC is '{name}' but it is not installed: `uv sync --extra json`")
+    return name
+
+
+CODEC = resolve()
+# Typed extraction needs msgspec; an explicit JSON_CODEC of another codec opts out.
+TYPED_EXTRACTION = msgspec is not None and JSON_CODEC in ('auto', 'msgspec')
+
+if msgspec is not None:
+    _decoder = msgspec.json.Decoder()
+    _encoder = msgspec.json.Encoder()
+
+    # Just the parts of an equipment payload that `structure_gear` reads.
+    # Anything else in the document is skipped by the parser rather than
+    # built into objects. omit_defaults keeps a missing field missing, so
+    # `structure_gear` still sees the KeyError it handles.
+    class _Typed(msgspec.Struct, omit_defaults=True):
+        type: Optional[str] = None
+
+    class _Item(msgspec.Struct, omit_defaults=True):
+        id: Optional[int] = None
+
+    class _Level(msgspec.Struct, omit_defaults=True):
+        value: Optional[int] = None
+
+    class _EquippedItem(msgspec.Struct, omit_defaults=True):
+        slot: Optional[_Typed] = None
+        item: Optional[_Item] = None
+        # A plain string for locale-scoped requests, a dict of translations otherwise.
+        name: Any = None
+        level: Optional[_Level] = None
+        quality: Optional[_Typed] = None
+        inventory_type: Optional[_Typed] = None
+
+    # Required, so an error body ({"code": 404, ...}) fails to decode like
+    # it does on the stdlib path instead of reading as no gear at all.
+    class _Equipment(msgspec.Struct):
+        equipped_items: List[_EquippedItem]
+
+    _equipment_decoder = msgspec.json.Decoder(_Equipment)
+
+
+def loads(data: bytes | str) -> Any:
+    """Decode a JSON document with the configured codec."""
+    if CODEC == 'orjson':
+        return orjson.loads(data)
+    if CODEC == 'msgspec':
+        return _decoder.decode(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode `obj` as compact UTF-8 JSON with the configured codec."""
+    if CODEC == 'orjson':
+        return orjson.dumps(obj)
+    if CODEC == 'msgspec':
+        return _encoder.encode(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def equipped_items(data: bytes | str) -> List[Dict[str, Any]]:
+    """Extract `equipped_items` from an equipment response.
+
+    With msgspec installed this parses straight into the few fields the
+    tracker stores, so stats, enchants, sockets and the localized display
+    strings are never materialised. Otherwise it falls back to a full
+    decode with the configured codec. Either way a body without
+    `equipped_items` raises rather than reading as an empty loadout.
+    """
+    if TYPED_EXTRACTION:
+        try:
+            return msgspec.to_builtins(_equipment_decoder.decode(data).equipped_items)
+        except msgspec.ValidationError as e:
+            raise KeyError('equipped_items') from e
+    return loads(data)['equipped_items']
@@ -1,17 +1,24 @@
+import argparse
 import logging.handlers
 from pathlib import Path
 import os
 import logging
-from typing import Dict
-import requests
-import json
+from typing import Dict, Optional
 from datetime import date
-from sqlalchemy import create_engine, select
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from tqdm.auto import tqdm
 from tqdm.contrib.logging import logging_redirect_tqdm
-from data_models import WoWCharacter, GearLog, CharacterProgress, Base
+from data_models import WoWCharacter, GearLog, CharacterProgress, init_db
 import wow_api_models as wow
+import item_level
+import chart_render
+import gear_events
+import database
+import http_client
+import json_codec
+import profiling
+from ingest_events import notify_ingested
 
 
 log = logging.getLogger(__name__)
@@ -44,15 +51,15 @@ def get_oauth_token(id: str, secret: str) -> Dict:
         "grant_type": "client_credentials",
     }
 
-    response = requests.post(base_url, data=data, auth=(id, secret))
-    return response.json()
+    response = http_client.post(base_url, data=data, auth=(id, secret))
+    return json_codec.loads(response.content)
 
 
 def get_equipment_for_character(
     region: str,
     realm: str,
     character: str,
-    locale: str = "en_US",
+    locale: str = wow.DEFAULT_LOCALE,
 ):
     global OAUTH_TOKEN, log
     if region == "cn":
@@ -70,27 +77,156 @@ def get_equipment_for_character(
 
     params = {":region": region, "namespace": f"profile-{region}", "locale": locale}
 
-    resp = requests.get(
-        url=f"https://{API_HOST}/{endpoint}",
+    resp = http_client.get(
+        f"https://{API_HOST}/{endpoint}",
         params=params,
         headers=auth
     )
-    return resp.json()
+    # Only `equipped_items` is ever read, so nothing else is decoded.
+    return {"equipped_items": json_codec.equipped_items(resp.content)}
 
 
 def get_engine():
+    return database.get_engine()
 
-    db_host = os.getenv("DB_HOST")
-    db_user = os.getenv("DB_USER")
-    db_port = os.getenv("DB_PORT")
-    db_pass = os.getenv("DB_PASS")
-    db_name = os.getenv("DB_NAME")
 
-    return create_engine(
-        f"postgresql+psycopg://{db_user}:{db_pass}@{db_host}:{db_port}/{db_name}",
-        echo=False
+def get_or_create_character(db_sess: Session, character: str) -> WoWCharacter:
+    this_character = db_sess.scalar(
+        select(WoWCharacter)
+        .where(WoWCharacter.key == character)
     )
-    
+
+    if not this_character:
+        region, realm, character_name = character.split('|')
+
+        this_character = WoWCharacter(
+            key = character,
+            region = region,
+            name = character_name,
+            realm = realm,
+        ) # type: ignore
+
+        db_sess.add(this_character)
+        db_sess.commit()
+
+    return this_character
+
+
+def structure_gear(equipment: Dict) -> Dict[str, Dict]:
+    structured_gear = {}
+
+    for obj in equipment["equipped_items"]:
+        slot = obj["slot"]["type"]
+        try:
+            structured_gear[slot] = {
+                "name": obj["name"],
+                "item_id": obj["item"]["id"],
+                "ilevel": obj["level"]["value"],
+                "quality": obj["quality"]["type"],
+            }
+            if slot == 'MAIN_HAND':
+                size = obj['inventory_type']['type']
+            else:
+                size = None
+
+            structured_gear[slot]['size'] = size
+        except KeyError:
+            log.debug(
+                f"Tried to get gear for slot {slot}, but that slot isn't in the data."
+            )
+            log.debug("Returned slots: ")
+            log.debug(
+                ", ".join(
+                    [item["slot"]["type"] for item in equipment["equipped_items"]]
+                )
+            )
+            structured_gear.pop(slot, None)
+            continue
+
+    return structured_gear
+
+
+def record_gear(
+    db_sess: Session,
+    this_character: WoWCharacter,
+    structured_gear: Dict[str, Dict],
+    record_date: Optional[date] = None,
+):
+    """Persist one day's gear, item level summary and progress row.
+
+    Shared by the sync `main()` loop and the async ingestion path, which
+    runs it through `AsyncSession.run_sync`.
+    """
+    if record_date is None:
+        record_date = date.today()
+
+    gear_logs: Dict[str, GearLog] = {
+        gear.slot: gear
+        for gear in db_sess.scalars(
+            select(GearLog)
+            .where(GearLog.character_id == this_character.id)
+            .where(GearLog.record_date == record_date)
+        )
+    }
+
+    # Compare against what we already stored today (a re-run), or else the
+    # last day we have, before anything is overwritten.
+    if gear_logs:
+        previous = {
+            slot: {'name': gear.name, 'item_id': gear.item_id, 'ilevel': gear.ilevel}
+            for slot, gear in gear_logs.items()
+        }
+    else:
+        previous = gear_events.previous_snapshot(db_sess, this_character.id, record_date)
+    gear_events.record_events(db_sess, this_character, previous, structured_gear, record_date)
+
+    for slot, gear in structured_gear.items():
+        if slot in gear_logs:
+            gear_logs[slot].update(**gear)
+        else:
+            gear_logs[slot] = GearLog(
+                wow_character = this_character,
+                record_date = record_date,
+                slot = slot,
+                **gear
+            )
+            db_sess.add(gear_logs[slot])
+
+    summary = item_level.record_summary(db_sess, this_character, structured_gear, record_date)
+    average_ilvl = summary.average_item_level
+
+    progress = db_sess.scalar(
+        select(CharacterProgress)
+        .where(CharacterProgress.character_id == this_character.id)
+        .where(CharacterProgress.record_date == record_date)
+    )
+    if not progress:
+        progress = CharacterProgress(
+            wow_character=this_character,
+            record_date=record_date,
+            average_item_level=average_ilvl
+        )
+        db_sess.add(progress)
+    else:
+        progress.update(average_item_level = average_ilvl)
+
+    notify_ingested(db_sess, this_character.id, record_date)
+
+    try:
+        db_sess.commit()
+    except Exception as e:
+        log.error(e)
+        db_sess.rollback()
+
+
+def write_snapshot(output_dir: Path, region: str, realm: str, character_name: str, structured_gear: Dict):
+    output_file = Path(output_dir, date.today().isoformat(), region, realm, character_name, 'equipment.json')
+
+    if not output_file.exists():
+        output_file.parent.mkdir(parents=True, exist_ok=True)
+        output_file.open(mode='w+').close()
+    output_file.write_bytes(json_codec.dumps(structured_gear))
+
 
 def main():
 
@@ -100,32 +236,18 @@ def main():
     output_dir = Path('.', 'storage', 'equipment')
 
     engine = get_engine()
-    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        init_db(conn)
 
+    ingested = []
     for character in tqdm(list_of_characters):
         log.debug(character)
         with Session(engine) as db_sess:
-            this_character = db_sess.scalar(
-                select(WoWCharacter)
-                .where(WoWCharacter.key == character)
-            )
-
-            if not this_character:
-                region, realm, character_name = character.split('|')
-
-                this_character = WoWCharacter(
-                    key = character,
-                    region = region,
-                    name = character_name,
-                    realm = realm,
-                ) # type: ignore
-
-                db_sess.add(this_character)
-                db_sess.commit()
-            else:
-                region = this_character.region
-                realm = this_character.realm
-                character_name = this_character.name
+            this_character = get_or_create_character(db_sess, character)
+            ingested.append(this_character.id)
+            region = this_character.region
+            realm = this_character.realm
+            character_name = this_character.name
 
             l_profile = wow.CharacterProfileSummary(
                 region=region,
@@ -142,106 +264,19 @@ def main():
                 log.error(f'Could not retrieve data for {character_name}.')
                 log.error(e)
 
-            output_file = Path(output_dir, date.today().isoformat(), region, realm, character_name, 'equipment.json')
-            
             equipment = get_equipment_for_character(region, realm, character_name)
-            
-            slots = [item["slot"]["type"] for item in equipment["equipped_items"]]
-
-            structured_gear = {}
-            gear_logs: Dict[str, GearLog] = {}
-            
-            stored_gear = db_sess.scalars(
-                select(GearLog)
-                .where(GearLog.wow_character == this_character)
-                .where(GearLog.record_date == date.today())
-                .order_by(GearLog.slot)
-            )
-            if stored_gear:
-                for gear in stored_gear:
-                    slot = gear.slot
-                    gear_logs[slot] = gear
-
-            for slot in slots:
-                try:
-                    obj = [
-                        item
-                        for item in equipment["equipped_items"]
-                        if item["slot"]["type"] == slot
-                    ][0]
-                    structured_gear[slot] = {
-                        "name": obj["name"],
-                        "item_id": obj["item"]["id"],
-                        "ilevel": obj["level"]["value"],
-                        "quality": obj["quality"]["type"],
-                    }
-                    if slot == 'MAIN_HAND':
-                        size = obj['inventory_type']['type']
-                    else:
-                        size = None
-                    
-                    structured_gear[slot]['size'] = size
-                        
-                    if slot in gear_logs:
-                        gear_logs[slot].update(**structured_gear[slot])
-                    else:
-                        gear_logs[slot] = GearLog(
-                            wow_character = this_character,
-                            record_date = date.today(),
-                            slot = slot,
-                            **structured_gear[slot]
-                        )
-                        db_sess.add(gear_logs[slot])
-                        db_sess.commit()
-                except KeyError:
-                    log.debug(
-                        f"Tried to get gear for slot {slot}, but that slot isn't in the data."
-                    )
-                    log.debug("Returned slots: ")
-                    log.debug(
-                        ", ".join(
-                            [item["slot"]["type"] for item in equipment["equipped_items"]]
-                        )
-                    )
-                    continue
-            
-            
-                try:
-                    for slot, gear_log in gear_logs.items():
-                        db_sess.add(gear_log)
-                        db_sess.commit()
-                except Exception as e:
-                    log.error(e)
-                    db_sess.rollback()
-                    continue
-
-            if not output_file.exists():
-                output_file.parent.mkdir(parents=True, exist_ok=True)
-                output_file.open(mode='w+').close()
-            output_file.write_text(json.dumps(structured_gear))
-
-            total_ilvl = sum([structured_gear[slot]["ilevel"] for slot in structured_gear])
-            if structured_gear['MAIN_HAND']['size'] == "TWOHWEAPON":
-                total_ilvl += structured_gear['MAIN_HAND']['ilevel']
-            average_ilvl = int(total_ilvl / 16)
-
-            progress = db_sess.scalar(
-                select(CharacterProgress)
-                .where(CharacterProgress.wow_character == this_character)
-                .where(CharacterProgress.record_date == date.today())
-            )
-            if not progress:
-                progress = CharacterProgress(
-                    wow_character=this_character,
-                    record_date=date.today(),
-                    average_item_level=average_ilvl
-                )
-                db_sess.add(progress)
-                db_sess.commit()
-            else:
-                progress.update(average_item_level = average_ilvl)
+            structured_gear = structure_gear(equipment)
+
+            write_snapshot(output_dir, region, realm, character_name, structured_gear)
+            record_gear(db_sess, this_character, structured_gear)
+
+    chart_render.render_all(ingested)
 
 
 if __name__ == "__main__":
-    with logging_redirect_tqdm():
+    parser = argparse.ArgumentParser(description='Ingest gear for the tracked characters.')
+    profiling.add_argument(parser)
+    args = parser.parse_args()
+
+    with logging_redirect_tqdm(), profiling.profiled('ingest', args.profile, all_threads=True):
         main()
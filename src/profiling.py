@@ -0,0 +1,169 @@
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+
+log = logging.getLogger(__name__)
+
+MODES = ('cprofile', 'sample')
+
+# PROFILE=cprofile|sample turns profiling on for ingestion runs and
+# dashboard reruns; the CLI --profile flag overrides it.
+PROFILE = os.getenv("PROFILE", "")
+PROFILE_DIR = Path(os.getenv("PROFILE_DIR", Path('.', 'storage', 'profiles')))
+SAMPLE_INTERVAL_MS = float(os.getenv("PROFILE_SAMPLE_INTERVAL_MS", "5"))
+# Lines of the cumulative-time summary written next to a cProfile dump.
+SUMMARY_LINES = 40
+
+# Only one cProfile can be active per process (Python 3.12 raises on a
+# second enable()), and dashboard reruns run concurrently in threads.
+_cprofile_lock = threading.Lock()
+
+
+def artifact_path(name: str, suffix: str, out_dir: Path = PROFILE_DIR) -> Path:
+    stamp = datetime.now().strftime('%Y%m%dT%H%M%S%f')
+    out_dir.mkdir(parents=True, exist_ok=True)
+    return Path(out_dir, f'{name}-{stamp}.{suffix}')
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f'{code.co_name} ({Path(code.co_filename).name}:{code.co_firstlineno})'
+
+
+def collapsed_stack(frame) -> str:
+    """`frame` and its callers as one folded stack line, root first."""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ';'.join(reversed(labels))
+
+
+class Sampler:
+    """Wall-clock sampling profiler that records folded stacks.
+
+    A daemon thread snapshots the stacks of the target thread (or of every
+    thread) each interval. Overhead is one stack walk per interval, so it
+    is safe to leave on for a whole nightly run. The output is the folded
+    format read by flamegraph.pl, speedscope and inferno.
+    """
+
+    def __init__(self, interval_ms: float = SAMPLE_INTERVAL_MS, all_threads: bool = False):
+        self.interval = interval_ms / 1000
+        self.all_threads = all_threads
+        self.stacks: Counter[str] = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own or (not self.all_threads and ident != self._target):
+                    continue
+                stack = collapsed_stack(frame)
+                if self.all_threads:
+                    stack = f'{names.get(ident, ident)};{stack}'
+                self.stacks[stack] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def write(self, path: Path):
+        with path.open('w') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+
+def write_cprofile(profile: cProfile.Profile, name: str, out_dir: Path = PROFILE_DIR) -> Path:
+    """Dump `profile` as .prof (for snakeviz/pstats) plus a readable summary."""
+    path = artifact_path(name, 'prof', out_dir)
+    profile.dump_stats(path)
+
+    summary = io.StringIO()
+    pstats.Stats(profile, stream=summary).sort_stats('cumulative').print_stats(SUMMARY_LINES)
+    path.with_suffix('.txt').write_text(summary.getvalue())
+    return path
+
+
+@contextmanager
+def profiled(
+    name: str,
+    mode: Optional[str] = None,
+    out_dir: Path = PROFILE_DIR,
+    all_threads: bool = False,
+) -> Iterator[None]:
+    """Profile the enclosed block if `mode` (default: $PROFILE) is set.
+
+    With no mode this is a no-op. Artifacts are named `<name>-<timestamp>`
+    in `out_dir`: `.prof` and `.txt` for cprofile, `.collapsed` for sample.
+    cProfile only sees the calling thread; use `sample` with `all_threads`
+    to include worker threads. While another block is under cProfile,
+    concurrent blocks run unprofiled rather than fail.
+    """
+    mode = PROFILE if mode is None else mode
+    if not mode:
+        yield
+        return
+    if mode not in MODES:
+        raise ValueError(f"Unknown profiling mode '{mode}', expected one of {', '.join(MODES)}")
+
+    if mode == 'cprofile':
+        if not _cprofile_lock.acquire(blocking=False):
+            log.debug(f'Not profiling {name}: another cProfile is active')
+            yield
+            return
+
+        try:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError as e:
+                # Some other profiler or debugger owns the hook.
+                log.warning(f'Not profiling {name}: {e}')
+                yield
+                return
+
+            try:
+                yield
+            finally:
+                profile.disable()
+                path = write_cprofile(profile, name, out_dir)
+                log.info(f'Wrote profile to {path}')
+        finally:
+            _cprofile_lock.release()
+    else:
+        sampler = Sampler(all_threads=all_threads)
+        sampler.start()
+        try:
+            yield
+        finally:
+            sampler.stop()
+            path = artifact_path(name, 'collapsed', out_dir)
+            sampler.write(path)
+            log.info(f'Wrote {sum(sampler.stacks.values())} samples to {path}')
+
+
+def add_argument(parser):
+    """Add the shared --profile flag to a script's argument parser."""
+    parser.add_argument(
+        '--profile',
+        choices=MODES,
+        default=PROFILE or None,
+        help='Profile the run (cprofile: deterministic, sample: low-overhead folded stacks)'
+    )
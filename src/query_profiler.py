@@ -0,0 +1,130 @@
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Deque, Dict, List, Optional
+from sqlalchemy import Engine, event
+import itertools
+import json
+import logging
+import os
+import random
+import re
+import time
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = float(os.getenv("QUERY_SAMPLE_RATE", "0.05"))
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_LOG = Path(os.getenv("SLOW_QUERY_LOG", Path('.', 'storage', 'slow_queries.jsonl')))
+HISTORY_SIZE = 5000
+
+_current_rerun: ContextVar[Optional[int]] = ContextVar('current_rerun', default=None)
+_rerun_ids = itertools.count(1)
+
+_literals = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_placeholders = re.compile(r"%\(\w+\)s|%s|:\w+")
+_whitespace = re.compile(r"\s+")
+_in_lists = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+
+
+def fingerprint(statement: str) -> str:
+    """Normalise a statement so that the same query with different values groups together."""
+    statement = _literals.sub('?', statement)
+    statement = _placeholders.sub('?', statement)
+    statement = _in_lists.sub('(?+)', statement)
+    return _whitespace.sub(' ', statement).strip()
+
+
+@dataclass
+class QueryRecord:
+    rerun: int
+    fingerprint: str
+    duration_ms: float
+    rows: int
+    started: float
+
+
+class QueryProfiler:
+    """Samples statements on `engine` and attributes them to dashboard reruns.
+
+    A rerun is either profiled in full or not at all, so per-rerun query
+    counts stay meaningful (which is what makes N+1 patterns visible).
+    """
+    _log: logging.Logger
+    records: Deque[QueryRecord]
+
+    def __init__(self, engine: Engine, sample_rate: float = SAMPLE_RATE, slow_query_ms: float = SLOW_QUERY_MS):
+        self._log = logging.getLogger('QueryProfiler')
+        self.sample_rate = sample_rate
+        self.slow_query_ms = slow_query_ms
+        self.records = deque(maxlen=HISTORY_SIZE)
+        self._lock = Lock()
+
+        event.listen(engine, "before_cursor_execute", self._before)
+        event.listen(engine, "after_cursor_execute", self._after)
+
+    def start_rerun(self, force: bool = False) -> Optional[int]:
+        """Begin a rerun; returns its id if it is being profiled."""
+        if force or random.random() < self.sample_rate:
+            rerun = next(_rerun_ids)
+        else:
+            rerun = None
+
+        _current_rerun.set(rerun)
+        return rerun
+
+    def resume_rerun(self, rerun: Optional[int]) -> Optional[int]:
+        """Carry on attributing queries to a rerun started earlier, e.g. by a widget callback."""
+        _current_rerun.set(rerun)
+        return rerun
+
+    def for_rerun(self, rerun: int) -> List[QueryRecord]:
+        with self._lock:
+            return [r for r in self.records if r.rerun == rerun]
+
+    def summary(self) -> List[Dict]:
+        """Per-fingerprint totals over everything recorded, slowest first."""
+        totals: Dict[str, Dict] = {}
+        with self._lock:
+            for r in self.records:
+                t = totals.setdefault(r.fingerprint, {"fingerprint": r.fingerprint, "calls": 0, "total_ms": 0.0, "rows": 0})
+                t["calls"] += 1
+                t["total_ms"] += r.duration_ms
+                t["rows"] += r.rows
+
+        return sorted(totals.values(), key=lambda t: t["total_ms"], reverse=True)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if _current_rerun.get() is None:
+            return
+        conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        rerun = _current_rerun.get()
+        if rerun is None or not conn.info.get('query_start'):
+            return
+
+        started = conn.info['query_start'].pop()
+        record = QueryRecord(
+            rerun=rerun,
+            fingerprint=fingerprint(statement),
+            duration_ms=(time.perf_counter() - started) * 1000,
+            rows=cursor.rowcount,
+            started=time.time(),
+        )
+
+        with self._lock:
+            self.records.append(record)
+
+        if record.duration_ms >= self.slow_query_ms:
+            self._log_slow(record)
+
+    def _log_slow(self, record: QueryRecord):
+        try:
+            SLOW_QUERY_LOG.parent.mkdir(parents=True, exist_ok=True)
+            with SLOW_QUERY_LOG.open(mode='a') as f:
+                f.write(json.dumps(asdict(record)) + '\n')
+        except OSError as e:
+            self._log.warning(f'Could not write slow query log: {e}')
@@ -0,0 +1,88 @@
+from typing import List, Literal, Optional, Tuple
+from sqlalchemy import Select, func, or_, select, tuple_
+from sqlalchemy.orm import Session
+
+from data_models import WoWCharacter
+from streaming import RosterRow
+
+PAGE_SIZE = 50
+REGIONS = ('us', 'eu', 'kr', 'tw')
+
+# Keyset for roster ordering: (name, id). Backed by ix_wow_character_name_id.
+RosterCursor = Tuple[str, int]
+
+
+def _roster_select(search: Optional[str]) -> Select:
+    stmt = select(
+        WoWCharacter.id,
+        WoWCharacter.key,
+        WoWCharacter.region,
+        WoWCharacter.realm,
+        WoWCharacter.name,
+        WoWCharacter.level,
+    )
+
+    if search:
+        term = search.lower().strip()
+        # Matches ix_wow_character_{name,realm}_pattern; `%` and `_` in
+        # the search are literal.
+        pattern = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions = [
+            func.lower(WoWCharacter.name).like(pattern, escape='\\'),
+            func.lower(WoWCharacter.realm).like(pattern, escape='\\'),
+        ]
+        if term in REGIONS:
+            conditions.append(WoWCharacter.region == term)
+        stmt = stmt.where(or_(*conditions))
+
+    return stmt
+
+
+def display_name(row: RosterRow) -> str:
+    return f"{row.name} ({row.realm}-{row.region.upper()})"
+
+
+def cursor_for(row: RosterRow) -> RosterCursor:
+    return (row.name, row.id)
+
+
+def get_page(
+    session: Session,
+    search: Optional[str] = None,
+    after: Optional[RosterCursor] = None,
+    limit: int = PAGE_SIZE,
+) -> List[RosterRow]:
+    """One page of the roster in (name, id) order, starting after `after`."""
+    stmt = _roster_select(search)
+    if after is not None:
+        stmt = stmt.where(tuple_(WoWCharacter.name, WoWCharacter.id) > after)
+
+    stmt = stmt.order_by(WoWCharacter.name, WoWCharacter.id).limit(limit)
+
+    return [RosterRow(*row) for row in session.execute(stmt)]
+
+
+def get_neighbour(
+    session: Session,
+    current: RosterCursor,
+    direction: Literal['next', 'prev'],
+    search: Optional[str] = None,
+) -> Optional[RosterRow]:
+    """The character just after (or before) `current`, or None at either end."""
+    stmt = _roster_select(search)
+    key = tuple_(WoWCharacter.name, WoWCharacter.id)
+
+    if direction == 'next':
+        stmt = stmt.where(key > current).order_by(WoWCharacter.name, WoWCharacter.id)
+    else:
+        stmt = stmt.where(key < current).order_by(WoWCharacter.name.desc(), WoWCharacter.id.desc())
+
+    row = session.execute(stmt.limit(1)).first()
+    return RosterRow(*row) if row is not None else None
+
+
+def get_character(session: Session, character_id: int) -> Optional[RosterRow]:
+    row = session.execute(
+        _roster_select(None).where(WoWCharacter.id == character_id)
+    ).first()
+    return RosterRow(*row) if row is not None else None
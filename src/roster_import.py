@@ -0,0 +1,113 @@
+import argparse
+import csv
+import json
+import logging
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+from data_models import init_db
+import database
+import ingest_events
+import sql_commands as sql
+
+log = logging.getLogger(__name__)
+
+KNOWN_REGIONS = ('us', 'eu', 'kr', 'tw')
+
+
+def read_roster(path: Path) -> Iterator[str]:
+    """Yield `region|realm|name` keys from a JSON list or a CSV file.
+
+    CSV files may have one key per line (optionally under a `key` header)
+    or separate `region`, `realm` and `name` columns.
+    """
+    if path.suffix.lower() == '.json':
+        with path.open() as f:
+            yield from json.load(f)
+        return
+
+    with path.open(newline='') as f:
+        sample = f.readline()
+        f.seek(0)
+        header = [col.strip().lower() for col in sample.split(',')]
+
+        if {'region', 'realm', 'name'} <= set(header):
+            for row in csv.DictReader(f):
+                row = {k.strip().lower(): v for k, v in row.items()}
+                yield f"{row['region']}|{row['realm']}|{row['name']}"
+        else:
+            rows = csv.reader(f)
+            if header == ['key']:
+                next(rows)
+            for row in rows:
+                if row:
+                    yield row[0]
+
+
+def split_keys(keys: Iterable[str]) -> Iterator[Tuple[str, str, str, str]]:
+    for key in keys:
+        try:
+            region, realm, name = key.lower().strip().split('|')
+        except ValueError:
+            log.warning(f'Skipping malformed roster entry {key!r}')
+            continue
+
+        region, realm, name = region.strip(), realm.strip(), name.strip()
+        if region not in KNOWN_REGIONS:
+            log.warning(f'Skipping roster entry {key!r}: unknown region {region!r}')
+            continue
+
+        yield f'{region}|{realm}|{name}', region, realm, name
+
+
+def import_roster(keys: Iterable[str], prune: bool = False) -> Tuple[int, int]:
+    """COPY `keys` into a staging table and merge them into `wow_character`.
+
+    Returns (characters added, characters pruned). With `prune`, characters
+    missing from the roster are removed, but only if they have no history.
+    """
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        init_db(conn)
+
+    raw = engine.raw_connection()
+    try:
+        with raw.driver_connection.cursor() as cur:
+            cur.execute(sql.create_roster_staging_sql)
+            with cur.copy(sql.copy_roster_staging_sql) as copy:
+                for row in split_keys(keys):
+                    copy.write_row(row)
+
+            cur.execute(sql.merge_roster_sql)
+            added = cur.rowcount
+
+            pruned = 0
+            if prune:
+                cur.execute(sql.prune_roster_sql)
+                pruned = cur.rowcount
+
+            ingest_events.notify_roster_changed(cur)
+
+        raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    return added, pruned
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import a roster of region|realm|name keys.')
+    parser.add_argument('roster', type=Path, help='CSV or JSON file of character keys')
+    parser.add_argument('--prune', action='store_true', help='Remove characters (without history) that are not in the roster')
+    args = parser.parse_args()
+
+    added, pruned = import_roster(read_roster(args.roster), prune=args.prune)
+    log.info(f'Added {added} characters, pruned {pruned}.')
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
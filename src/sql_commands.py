@@ -33,7 +33,7 @@ SELECT
     region,
     realm,
     level
-FROM wow_characters
+FROM wow_character
 WHERE id = :id;
 """
 
@@ -58,12 +58,10 @@ ON CONFLICT (key) DO UPDATE SET (
     name,
     level
 ) = (
-    :region,
-    :realm,
-    :name,
-    :level
-) WHERE (
-    wow_character.key = 'test'
+    excluded.region,
+    excluded.realm,
+    excluded.name,
+    coalesce(excluded.level, wow_character.level)
 );
 """
 
@@ -87,3 +85,274 @@ delete_character_sql = """
 DELETE FROM wow_character
 WHERE wow_character.key = :key;
 """
+
+create_roster_staging_sql = """
+CREATE TEMPORARY TABLE roster_staging (
+    "key" character varying,
+    "region" character varying(2),
+    "realm" character varying(30),
+    "name" character varying(30)
+) ON COMMIT DROP;
+"""
+
+copy_roster_staging_sql = """
+COPY roster_staging (key, region, realm, name) FROM STDIN
+"""
+
+merge_roster_sql = """
+INSERT INTO wow_character (
+    key,
+    region,
+    realm,
+    name
+)
+SELECT DISTINCT ON (key)
+    key,
+    region,
+    realm,
+    name
+FROM roster_staging
+WHERE region IN ('us', 'eu', 'kr', 'tw')
+ORDER BY key
+ON CONFLICT (key) DO NOTHING;
+"""
+
+# Synthetic characters for load testing (see synthetic.py). RETURNING
+# hands back the ids actually inserted, so re-running with the same
+# prefix skips characters that already exist instead of duplicating them.
+create_synthetic_staging_sql = """
+CREATE TEMPORARY TABLE synthetic_staging (
+    "key" character varying,
+    "region" character varying(2),
+    "realm" character varying(30),
+    "name" character varying(30),
+    "level" integer
+) ON COMMIT DROP;
+"""
+
+copy_synthetic_staging_sql = """
+COPY synthetic_staging (key, region, realm, name, level) FROM STDIN
+"""
+
+merge_synthetic_characters_sql = """
+INSERT INTO wow_character (
+    key,
+    region,
+    realm,
+    name,
+    level
+)
+SELECT
+    key,
+    region,
+    realm,
+    name,
+    level
+FROM synthetic_staging
+ON CONFLICT (key) DO NOTHING
+RETURNING id, key;
+"""
+
+prune_roster_sql = """
+DELETE FROM wow_character AS c
+WHERE NOT EXISTS (SELECT 1 FROM roster_staging AS r WHERE r.key = c.key)
+  AND NOT EXISTS (SELECT 1 FROM gear_log AS g WHERE g.character_id = c.id)
+  AND NOT EXISTS (SELECT 1 FROM progress_log AS p WHERE p.character_id = c.id)
+  AND NOT EXISTS (SELECT 1 FROM ilvl_summary AS s WHERE s.character_id = c.id)
+  AND NOT EXISTS (SELECT 1 FROM gear_event AS e WHERE e.character_id = c.id)
+  AND NOT EXISTS (SELECT 1 FROM annotation AS a WHERE a.character_id = c.id);
+"""
+
+# Item level rules, in SQL, for history that predates ilvl_summary. Must
+# match item_level.total_item_level: a two-hander counts twice when the
+# off hand is empty, and shirt/tabard are ignored.
+equipped_slots = (
+    'HEAD', 'NECK', 'SHOULDER', 'BACK', 'CHEST', 'WAIST', 'HANDS', 'WRIST',
+    'LEGS', 'FEET', 'FINGER_1', 'FINGER_2', 'TRINKET_1', 'TRINKET_2',
+    'MAIN_HAND', 'OFF_HAND'
+)
+
+equipped_slots_sql = ", ".join(f"'{slot}'" for slot in equipped_slots)
+
+total_item_level_sql = """
+    sum(ilevel) + CASE
+        WHEN bool_or(slot = 'MAIN_HAND' AND size = 'TWOHWEAPON')
+         AND NOT bool_or(slot = 'OFF_HAND')
+        THEN max(ilevel) FILTER (WHERE slot = 'MAIN_HAND')
+        ELSE 0
+    END
+"""
+
+backfill_ilvl_summary_sql = f"""
+INSERT INTO ilvl_summary (
+    character_id,
+    record_date,
+    total_item_level,
+    average_item_level,
+    slots_equipped
+)
+SELECT
+    character_id,
+    record_date,
+    total_item_level,
+    total_item_level / 16,
+    slots_equipped
+FROM (
+    SELECT
+        character_id,
+        record_date,
+        {total_item_level_sql} AS total_item_level,
+        count(*) AS slots_equipped
+    FROM gear_log AS g
+    WHERE slot IN ({equipped_slots_sql})
+      AND NOT EXISTS (
+        SELECT 1
+        FROM ilvl_summary AS s
+        WHERE s.character_id = g.character_id
+          AND s.record_date = g.record_date
+      )
+    GROUP BY character_id, record_date
+) AS daily
+ON CONFLICT (character_id, record_date) DO NOTHING;
+"""
+
+daily_ilvl_select_sql = """
+SELECT
+    record_date,
+    average_item_level
+FROM ilvl_summary
+WHERE character_id = :character_id
+  AND record_date >= :since
+"""
+
+daily_ilvl_sql = f"""
+{daily_ilvl_select_sql}
+ORDER BY record_date;
+"""
+
+first_record_date_sql = """
+SELECT min(record_date)
+FROM ilvl_summary
+WHERE character_id = :character_id;
+"""
+
+# :bucket is a date_trunc field - 'day', 'week' or 'month'.
+bucketed_ilvl_sql = f"""
+WITH daily AS (
+{daily_ilvl_select_sql}
+)
+SELECT
+    date_trunc(:bucket, record_date)::date AS bucket,
+    min(average_item_level) AS min_ilvl,
+    round(avg(average_item_level))::integer AS avg_ilvl,
+    max(average_item_level) AS max_ilvl
+FROM daily
+GROUP BY 1
+ORDER BY 1;
+"""
+
+roster_overview_sql = """
+WITH latest AS (
+    SELECT DISTINCT ON (character_id)
+        character_id,
+        average_item_level
+    FROM ilvl_summary
+    ORDER BY character_id, record_date DESC
+), week_ago AS (
+    SELECT DISTINCT ON (character_id)
+        character_id,
+        average_item_level
+    FROM ilvl_summary
+    WHERE record_date <= :week_ago
+    ORDER BY character_id, record_date DESC
+), history AS (
+    SELECT
+        character_id,
+        array_agg(average_item_level ORDER BY record_date) AS ilvl_history
+    FROM ilvl_summary
+    WHERE record_date >= :history_since
+    GROUP BY character_id
+), this_week AS (
+    SELECT
+        character_id,
+        bool_or(pinnacle_quest_done) AS pinnacle,
+        bool_or(profession_1_quest_done) AS prof_1,
+        bool_or(profession_2_quest_done) AS prof_2,
+        sum(delves_completed) AS delves_completed
+    FROM progress_log
+    WHERE record_date >= :week_start
+    GROUP BY character_id
+)
+SELECT
+    c.id,
+    c.name,
+    c.realm,
+    c.region,
+    c.level,
+    latest.average_item_level AS ilvl,
+    latest.average_item_level - week_ago.average_item_level AS ilvl_delta_7d,
+    coalesce(this_week.pinnacle, false) AS pinnacle,
+    coalesce(this_week.prof_1, false) AS prof_1,
+    coalesce(this_week.prof_2, false) AS prof_2,
+    coalesce(this_week.delves_completed, 0) AS delves_completed,
+    history.ilvl_history
+FROM wow_character AS c
+LEFT JOIN latest ON latest.character_id = c.id
+LEFT JOIN week_ago ON week_ago.character_id = c.id
+LEFT JOIN history ON history.character_id = c.id
+LEFT JOIN this_week ON this_week.character_id = c.id
+ORDER BY c.name, c.realm, c.region;
+"""
+
+# Gear history pivoted to one row per day and one column per slot.
+slot_pivot_sql = f"""
+SELECT
+    record_date,
+    {",\n    ".join(f"max(ilevel) FILTER (WHERE slot = '{slot}') AS \"{slot}\"" for slot in equipped_slots)}
+FROM gear_log
+WHERE character_id = :character_id
+  AND record_date >= :since
+GROUP BY record_date
+ORDER BY record_date;
+"""
+
+# create_all() won't add indexes to an existing table.
+create_gear_log_index_sql = """
+CREATE INDEX IF NOT EXISTS ix_gear_log_character_date
+    ON gear_log (character_id, record_date);
+"""
+
+create_roster_index_sql = """
+CREATE INDEX IF NOT EXISTS ix_wow_character_name_id
+    ON wow_character (name, id);
+"""
+
+# text_pattern_ops lets `lower(name) LIKE 'term%'` use the index whatever
+# the database collation is.
+create_roster_name_search_index_sql = """
+CREATE INDEX IF NOT EXISTS ix_wow_character_name_pattern
+    ON wow_character (lower(name) text_pattern_ops);
+"""
+
+create_roster_realm_search_index_sql = """
+CREATE INDEX IF NOT EXISTS ix_wow_character_realm_pattern
+    ON wow_character (lower(realm) text_pattern_ops);
+"""
+
+changes_this_week_sql = """
+SELECT
+    c.name,
+    c.realm,
+    e.record_date,
+    e.slot,
+    e.old_name,
+    e.old_ilevel,
+    e.new_name,
+    e.new_ilevel
+FROM gear_event AS e
+JOIN wow_character AS c
+    ON c.id = e.character_id
+WHERE e.record_date >= :week_start
+ORDER BY e.record_date DESC, c.name, e.slot
+LIMIT :limit;
+"""
@@ -0,0 +1,95 @@
+from datetime import date
+from typing import Collection, Iterator, NamedTuple, Optional
+from sqlalchemy import Select, select
+from sqlalchemy.orm import Session
+
+from data_models import CharacterProgress, ItemLevelSummary
+
+# Rows fetched per round trip from the server-side cursor.
+BATCH_SIZE = 2000
+
+
+class RosterRow(NamedTuple):
+    id: int
+    key: str
+    region: str
+    realm: str
+    name: str
+    level: Optional[int]
+
+
+class ProgressRow(NamedTuple):
+    character_id: int
+    record_date: date
+    average_item_level: int
+    pinnacle_quest_done: bool
+    profession_1_quest_done: bool
+    profession_2_quest_done: bool
+    delves_completed: int
+
+
+class ItemLevelRow(NamedTuple):
+    character_id: int
+    record_date: date
+    average_item_level: int
+
+
+def stream(session: Session, stmt: Select, batch_size: int = BATCH_SIZE) -> Iterator[tuple]:
+    """Execute `stmt` on a server-side cursor and yield plain rows.
+
+    `yield_per` turns on `stream_results`, so only `batch_size` rows are
+    held in memory at a time regardless of how large the result is.
+    """
+    result = session.execute(stmt, execution_options={"yield_per": batch_size})
+    for partition in result.tuples().partitions():
+        yield from partition
+
+
+def stream_progress(
+    session: Session,
+    character_id: Optional[int] = None,
+    since: Optional[date] = None,
+    batch_size: int = BATCH_SIZE,
+) -> Iterator[ProgressRow]:
+    stmt = select(
+        CharacterProgress.character_id,
+        CharacterProgress.record_date,
+        CharacterProgress.average_item_level,
+        CharacterProgress.pinnacle_quest_done,
+        CharacterProgress.profession_1_quest_done,
+        CharacterProgress.profession_2_quest_done,
+        CharacterProgress.delves_completed,
+    ).order_by(CharacterProgress.character_id, CharacterProgress.record_date)
+
+    if character_id is not None:
+        stmt = stmt.where(CharacterProgress.character_id == character_id)
+    if since is not None:
+        stmt = stmt.where(CharacterProgress.record_date >= since)
+
+    for row in stream(session, stmt, batch_size):
+        yield ProgressRow(*row)
+
+
+def stream_ilvl_history(
+    session: Session,
+    character_id: Optional[int] = None,
+    since: Optional[date] = None,
+    batch_size: int = BATCH_SIZE,
+    character_ids: Optional[Collection[int]] = None,
+) -> Iterator[ItemLevelRow]:
+    stmt = select(
+        ItemLevelSummary.character_id,
+        ItemLevelSummary.record_date,
+        ItemLevelSummary.average_item_level,
+    ).order_by(ItemLevelSummary.character_id, ItemLevelSummary.record_date)
+
+    if character_id is not None:
+        stmt = stmt.where(ItemLevelSummary.character_id == character_id)
+    if character_ids is not None:
+        stmt = stmt.where(ItemLevelSummary.character_id.in_(character_ids))
+    if since is not None:
+        stmt = stmt.where(ItemLevelSummary.record_date >= since)
+
+    for row in stream(session, stmt, batch_size):
+        yield ItemLevelRow(*row)
+
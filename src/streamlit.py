@@ -1,301 +1,565 @@
-from typing import List, Optional, Sequence, Tuple
-from csv import reader as csv_reader
+from typing import Callable, List, Literal, NamedTuple, Optional, Sequence, Tuple
+import functools
 import streamlit as st
 import pandas as pd
-from sqlalchemy import text, select
-from sqlalchemy.orm import Session
-from matplotlib.axes import Axes
-from matplotlib.dates import DateFormatter, WeekdayLocator
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from sqlalchemy import text, update
 from datetime import date, timedelta
-from calendar import TUESDAY
-
-from data_models import WoWCharacter, CharacterProgress, GearLog
-
-conn = st.connection('wow_char_db', type='sql')
-conn.engine.echo = True
-
-VALID_SLOTS = [
-    'HEAD',
-    'NECK',
-    'SHOULDER',
-    'BACK',
-    'CHEST',
-    'WAIST',
-    'HANDS',
-    'WRIST',
-    'LEGS',
-    'FEET',
-    'FINGER_1',
-    'FINGER_2',
-    'TRINKET_1',
-    'TRINKET_2',
-    'MAIN_HAND',
-    'OFF_HAND'
-]
-
-
-def get_todays_progress(s: Session, character: WoWCharacter) -> CharacterProgress:
-    global conn
+from pathlib import Path
+import os
+
+from data_models import CharacterProgress
+import database
+import sql_commands as sql
+import chart_render
+import annotations
+import roster
+import analytics
+import weeks
+from streaming import RosterRow
+from ingest_events import IngestWatcher
+from query_profiler import QueryProfiler
+import query_profiler
+import profiling
+
+DB_URL = st.secrets['connections']['wow_char_db']['url']
+OVERVIEW_HISTORY_DAYS = 14
+# Most recent gear changes listed under the roster overview.
+OVERVIEW_CHANGES = 500
+SEASON_START = date.fromisoformat(os.getenv("SEASON_START", "2024-09-10"))
+HISTORY_RANGES = ['Last 30 Days', 'Season', 'Year', 'All']
+SLOT_HISTORY_DAYS = 365
+UPGRADE_STYLE = 'font-weight: bold; border: 2px solid red'
+
+
+class WeeklyProgress(NamedTuple):
+    character_id: int
+    average_item_level: Optional[int]
+    pinnacle_quest_done: bool
+    profession_1_quest_done: bool
+    profession_2_quest_done: bool
+    previous_delves: int
+    todays_delves: int
+
+
+PROGRESS_FLAGS = {
+    'pinnacle_done': 'pinnacle_quest_done',
+    'prof_1_done': 'profession_1_quest_done',
+    'prof_2_done': 'profession_2_quest_done',
+}
+
+
+def get_week_start(today: date) -> date:
+    return weeks.reset_week_start(today)
+
+
+@st.cache_resource
+def get_watcher() -> IngestWatcher:
+    return IngestWatcher(DB_URL)
+
+
+@st.cache_resource
+def get_profiler() -> QueryProfiler:
+    # Listen on the engine the dashboard's sessions are actually bound to.
+    return QueryProfiler(database.get_sessionmaker(DB_URL).kw['bind'])
+
+
+def rerun_callback(callback: Callable) -> Callable:
+    """Attribute a widget callback's queries to the rerun it triggers.
+
+    Callbacks run before the script body, so the rerun is started here and
+    `run()` resumes it instead of starting another.
+    """
+    @functools.wraps(callback)
+    def wrapper(*args, **kwargs):
+        profiler = get_profiler()
+        st.session_state['query_rerun'] = profiler.start_rerun(force=st.session_state.get('query_debug', False))
+        return callback(*args, **kwargs)
+
+    return wrapper
+
+
+@st.cache_data
+def get_roster_overview(version: Tuple[int, int], today: date) -> pd.DataFrame:
+    """One row per character from the rollup tables, in a single query."""
+    stmt = text(sql.roster_overview_sql).bindparams(
+        week_start=get_week_start(today),
+        week_ago=today - timedelta(days=7),
+        history_since=today - timedelta(days=OVERVIEW_HISTORY_DAYS)
+    )
+
+    with database.get_session(DB_URL) as s:
+        result = s.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
+
+
+@st.cache_data
+def get_changes_this_week(version: Tuple[int, int], today: date) -> pd.DataFrame:
+    """Gear changes across the roster since the reset, newest first."""
+    stmt = text(sql.changes_this_week_sql).bindparams(
+        week_start=get_week_start(today),
+        limit=OVERVIEW_CHANGES
+    )
+
+    with database.get_session(DB_URL) as s:
+        result = s.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys()))
 
-    today = date.today()
-    offset = (today.weekday() - TUESDAY) % 7
-    last_tuesday = today - timedelta(days=offset)
-    if last_tuesday == today:
-        last_tuesday -= timedelta(days=7)
 
-    
+@st.cache_data
+def get_weekly_progress(character_id: int, today: date, version: Tuple) -> WeeklyProgress:
+    """Roll up this reset week's progress for one character. Read only."""
     stmt = text("""
         SELECT
-            c.id,
-            max(l.average_item_level) as ilvl,
-            bool_or(l.pinnacle_quest_done) as pinnacle,
-            bool_or(profession_1_quest_done) as prof_1,
-            bool_or(profession_2_quest_done) as prof_2,
-            sum(delves_completed) as delves_completed,
-            string_agg(to_char(l.record_date, 'yyyy-mm-dd'), '|' order by l.record_date ASC)
+            max(s.average_item_level) as ilvl,
+            coalesce(bool_or(l.pinnacle_quest_done), false) as pinnacle,
+            coalesce(bool_or(profession_1_quest_done), false) as prof_1,
+            coalesce(bool_or(profession_2_quest_done), false) as prof_2,
+            coalesce(sum(delves_completed) FILTER (WHERE l.record_date < :today), 0) as previous_delves,
+            coalesce(sum(delves_completed) FILTER (WHERE l.record_date = :today), 0) as todays_delves
         FROM progress_log as l
-        LEFT JOIN wow_character as c
-            ON l.character_id = c.id
-        WHERE 1=1
-        AND (false
-            OR c.level = 80
-            OR c.level is NULL
-        )
-        AND l.record_date >= CASE
-            WHEN EXTRACT(DOW FROM CURRENT_DATE) = 2 THEN CURRENT_DATE - INTERVAL '7 days'
-            ELSE CURRENT_DATE - INTERVAL '1 day' * ((EXTRACT(DOW FROM CURRENT_DATE) + 5) % 7)
-        END
-        AND c.key = :character_key
-        GROUP BY c.id
-    """).bindparams(character_key=character.key)
-
-    result = s.execute(
-        statement=stmt
-    ).first()
-
-    if result is None:
-        raise Exception("No rows returned")
-    
-    char_prog = CharacterProgress(
-        character_id=result[0],
-        record_date=result[6].split('|')[-1],
-        average_item_level=result[1],
-        pinnacle_quest_done=result[2],
-        profession_1_quest_done=result[3],
-        profession_2_quest_done=result[4],
-        delves_completed=result[5]
+        LEFT JOIN ilvl_summary as s
+            ON s.character_id = l.character_id
+           AND s.record_date = l.record_date
+        WHERE l.character_id = :character_id
+          AND l.record_date >= :week_start
+    """).bindparams(
+        character_id=character_id,
+        today=today,
+        week_start=get_week_start(today)
+    )
+
+    with database.get_session(DB_URL) as s:
+        result = s.execute(statement=stmt).one()
+
+    return WeeklyProgress(character_id, *result)
+
+
+@rerun_callback
+def save_progress(character_id: int, today: date, version: Tuple):
+    """Persist the dashboard inputs; only writes when a value actually changed."""
+    weekly = get_weekly_progress(character_id, today, version)
+    changed = False
+
+    with database.get_session(DB_URL) as s:
+        for state_key, column in PROGRESS_FLAGS.items():
+            value = st.session_state[state_key]
+            if value == getattr(weekly, column):
+                continue
+
+            if value:
+                changed |= CharacterProgress.record(s, character_id, today, **{column: True})
+            else:
+                # The weekly flag is an OR over the week, so un-ticking it
+                # has to clear every day it was set on.
+                s.execute(
+                    update(CharacterProgress)
+                    .where(CharacterProgress.character_id == character_id)
+                    .where(CharacterProgress.record_date >= get_week_start(today))
+                    .where(getattr(CharacterProgress, column).is_(True))
+                    .values({column: False})
+                )
+                s.commit()
+                changed = True
+
+        if st.session_state['todays_delves'] != weekly.todays_delves:
+            changed |= CharacterProgress.record(
+                s, character_id, today, delves_completed=st.session_state['todays_delves']
+            )
+
+    if changed:
+        get_weekly_progress.clear()
+        get_roster_overview.clear()
+
+
+def get_chart(character_id: int, version: Tuple, annotations_version: Tuple, today: date) -> Optional[Path]:
+    """Path to the stored chart for the character's latest day of history.
+
+    Charts are normally rendered after ingestion (see `chart_render`); if
+    one is missing it is rendered once here and stored for later reruns.
+    """
+    history = get_ilvl_history(character_id, version, today)
+    if not history:
+        return None
+
+    chart_annotations = get_annotations(character_id, history[0][0], history[-1][0], annotations_version)
+    path = chart_render.chart_path(character_id, history, chart_annotations)
+    if not path.exists():
+        path = chart_render.render_chart(character_id, history, chart_annotations)
+
+    return path
+
+@st.cache_data
+def get_ilvl_history(
+    character_id: int,
+    version: Tuple,
+    today: date,
+    count: int = chart_render.HISTORY_DAYS,
+) -> Sequence[Tuple[date, int]]:
+    # `today` is an argument so the cached window moves on at midnight.
+    stmt = text(sql.daily_ilvl_sql).bindparams(
+        character_id=character_id,
+        since=today - timedelta(days=count)
+    )
+
+    with database.get_session(DB_URL) as s:
+        return s.execute(stmt).tuples().all()
+
+@st.cache_data
+def get_first_record_date(character_id: int, version: Tuple) -> Optional[date]:
+    with database.get_session(DB_URL) as s:
+        return s.scalar(text(sql.first_record_date_sql).bindparams(character_id=character_id))
+
+
+def get_bucket(since: date, today: date) -> str:
+    """Pick a date_trunc bucket that keeps the series to a few hundred points."""
+    span = (today - since).days
+    if span <= 180:
+        return 'day'
+    elif span <= 1095:
+        return 'week'
+    else:
+        return 'month'
+
+
+@st.cache_data
+def get_bucketed_ilvl_history(character_id: int, version: Tuple, since: date, bucket: str) -> pd.DataFrame:
+    stmt = text(sql.bucketed_ilvl_sql).bindparams(
+        character_id=character_id,
+        since=since,
+        bucket=bucket
+    )
+
+    with database.get_session(DB_URL) as s:
+        result = s.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys())).set_index('bucket')
+
+
+def show_history(character_id: int, version: Tuple, annotations_version: Tuple):
+    history_range = st.radio(label="History", options=HISTORY_RANGES, horizontal=True)
+    today = date.today()
+
+    if history_range == 'Last 30 Days':
+        chart = get_chart(character_id, version, annotations_version, today)
+        if chart is not None:
+            st.image(str(chart))
+        return
+
+    if history_range == 'Season':
+        since = SEASON_START
+    elif history_range == 'Year':
+        since = today - timedelta(days=365)
+    else:
+        since = date.min
+
+    first_record_date = get_first_record_date(character_id, version)
+    if first_record_date is None:
+        return
+
+    # Size the bucket on the history there is, not the range asked for, so
+    # 'All' on a new character still shows daily points.
+    bucket = get_bucket(max(since, first_record_date), today)
+    history_df = get_bucketed_ilvl_history(character_id, version, since, bucket)
+    if history_df.empty:
+        return
+
+    st.caption(f"Item level per {bucket} (min / average / max)")
+    st.line_chart(history_df[['min_ilvl', 'avg_ilvl', 'max_ilvl']])
+
+
+@st.cache_data
+def get_slot_history(character_id: int, version: Tuple, today: date, count: int = SLOT_HISTORY_DAYS) -> pd.DataFrame:
+    """Slot x date item levels for one character, pivoted by the database."""
+    stmt = text(sql.slot_pivot_sql).bindparams(
+        character_id=character_id,
+        since=today - timedelta(days=count)
     )
 
-    s.add(char_prog)
-    s.commit()
+    with database.get_session(DB_URL) as s:
+        result = s.execute(stmt)
+        return pd.DataFrame(result.all(), columns=list(result.keys())).set_index('record_date')
 
-    f"out: {char_prog.id}"
-    return char_prog
 
-def get_gear_chart(character: WoWCharacter) -> Tuple[Figure, Axes]:
-    global VALID_SLOTS
-    gear_logs = get_logs(character)
+def show_slot_heatmap(character_id: int, version: Tuple, today: date):
+    slot_df, upgrades = analytics.slot_upgrades(get_slot_history(character_id, version, today))
+    if slot_df.empty:
+        return
 
-    logs_df = pd.DataFrame(
-        [gl.__dict__ for gl in gear_logs]
+    heatmap = slot_df.T
+    heatmap.columns = [d.strftime('%d %b %y') for d in heatmap.columns]
+    upgrade_css = upgrades.T.set_axis(heatmap.columns, axis=1).replace({True: UPGRADE_STYLE, False: ''})
+
+    st.dataframe(
+        heatmap.style
+        .background_gradient(axis=None, cmap='viridis')
+        .apply(lambda _: upgrade_css, axis=None)
+        .format(precision=0, na_rep='')
     )
-    
-    logs_df['_record_date'] = logs_df.apply(lambda x: x['record_date'].isoformat(), axis=1)
-    logs_df['d_record_date'] = logs_df.apply(lambda x: x['record_date'], axis=1)
-    logs_df['_slot'] = logs_df['slot']
-    logs_df.set_index(['_slot', 'd_record_date'], inplace=True)
-    logs_df.sort_index(inplace=True)
 
-    logs_df.drop(columns=['_sa_instance_state'], inplace=True)
 
-    for slot in VALID_SLOTS:
+@st.cache_data
+def get_annotations(character_id: int, since: date, until: date, version: Tuple) -> List[Tuple[date, str]]:
+    with database.get_session(DB_URL) as s:
+        return annotations.get_annotations(s, since, until, character_id)
+
+@rerun_callback
+def save_annotation(character_id: int):
+    character_id = character_id if st.session_state['annotation_scoped'] else None
+
+    with database.get_session(DB_URL) as s:
         try:
-            test = logs_df.loc[slot]  # noqa: F841
-        except KeyError:
-            VALID_SLOTS.remove(slot)
-            pass
-    
-    filtered_df = logs_df.loc[VALID_SLOTS]
+            annotations.add_annotation(
+                s,
+                st.session_state['annotation_date'],
+                st.session_state['annotation_event'],
+                character_id
+            )
+        except ValueError as e:
+            st.sidebar.error(str(e))
+            return
+
+    get_annotations.clear()
+
+def show_annotation_form(character_id: int):
+    with st.sidebar.form(key='annotation_form', clear_on_submit=True):
+        st.subheader("Add Annotation")
+        st.date_input(label="Date", key='annotation_date')
+        st.text_input(label="Event", key='annotation_event')
+        st.checkbox(label="Only for this character", key='annotation_scoped')
+        st.form_submit_button(
+            label="Add",
+            on_click=save_annotation,
+            kwargs={"character_id": character_id}
+        )
 
-    filtered_df = filtered_df[['ilevel']]
+@st.cache_data
+def get_roster_page(search: str, after: Optional[roster.RosterCursor], version: Tuple[int, int]) -> List[RosterRow]:
+    with database.get_session(DB_URL) as s:
+        return roster.get_page(s, search, after)
+
+@st.cache_data
+def get_roster_character(character_id: int, version: Tuple[int, int]) -> Optional[RosterRow]:
+    with database.get_session(DB_URL) as s:
+        return roster.get_character(s, character_id)
+
+@rerun_callback
+def step_char(current: RosterRow, direction: Literal['next', 'prev']):
+    with database.get_session(DB_URL) as s:
+        neighbour = roster.get_neighbour(s, roster.cursor_for(current), direction, st.session_state['roster_search'])
+
+    # At either end of the roster, stay where we are.
+    if neighbour is not None:
+        st.session_state['this_char'] = neighbour.id
+
+def step_page(page: List[RosterRow], direction: Literal['next', 'prev']):
+    pages = st.session_state['roster_pages']
+    if direction == 'next' and len(page) == roster.PAGE_SIZE:
+        pages.append(roster.cursor_for(page[-1]))
+    elif direction == 'prev' and len(pages) > 1:
+        pages.pop()
+
+def reset_pages():
+    st.session_state['roster_pages'] = [None]
+
+def select_char():
+    if st.session_state['roster_select'] is not None:
+        st.session_state['this_char'] = st.session_state['roster_select']
+
+
+def show_overview(watcher: IngestWatcher):
+    st.title("Roster Overview")
+
+    overview_df = get_roster_overview(watcher.roster_version, date.today())
+
+    st.dataframe(
+        overview_df.drop(columns=['id']),
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'name': st.column_config.TextColumn('Name'),
+            'realm': st.column_config.TextColumn('Realm'),
+            'region': st.column_config.TextColumn('Region'),
+            'level': st.column_config.NumberColumn('Level'),
+            'ilvl': st.column_config.NumberColumn('Item Level'),
+            'ilvl_delta_7d': st.column_config.NumberColumn('7 Day Change', format='%+d'),
+            'pinnacle': st.column_config.CheckboxColumn('Pinnacle'),
+            'prof_1': st.column_config.CheckboxColumn('Profession 1'),
+            'prof_2': st.column_config.CheckboxColumn('Profession 2'),
+            'delves_completed': st.column_config.NumberColumn('Delves'),
+            'ilvl_history': st.column_config.LineChartColumn(f'Last {OVERVIEW_HISTORY_DAYS} Days'),
+        }
+    )
 
-    grouped_df = filtered_df.groupby('d_record_date').sum()
+    st.subheader("Changed This Week")
+    changes_df = get_changes_this_week(watcher.roster_version, date.today())
+    if changes_df.empty:
+        st.caption("No gear changes since the weekly reset.")
+        return
+
+    st.dataframe(
+        changes_df,
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            'name': st.column_config.TextColumn('Name'),
+            'realm': st.column_config.TextColumn('Realm'),
+            'record_date': st.column_config.DateColumn('Date', format='DD MMM'),
+            'slot': st.column_config.TextColumn('Slot'),
+            'old_name': st.column_config.TextColumn('Replaced'),
+            'old_ilevel': st.column_config.NumberColumn('Old ilvl'),
+            'new_name': st.column_config.TextColumn('New Item'),
+            'new_ilevel': st.column_config.NumberColumn('New ilvl'),
+        }
+    )
 
-    grouped_df['average_ilevel'] = grouped_df.apply(lambda x: int(x['ilevel'] / 16), axis=1)
 
-    final_df = grouped_df.reset_index().sort_index()
+def show_character(watcher: IngestWatcher):
+    st.title("Character Progress Tracker")
+
+    if 'roster_pages' not in st.session_state:
+        reset_pages()
+
+    search = st.sidebar.text_input(label="Search name, realm or region", key='roster_search', on_change=reset_pages)
+    page = get_roster_page(search, st.session_state['roster_pages'][-1], watcher.roster_version)
+
+    if 'this_char' not in st.session_state:
+        if not page:
+            st.write("No characters found.")
+            return
+        st.session_state['this_char'] = page[0].id
+
+    current = get_roster_character(st.session_state['this_char'], watcher.roster_version)
+    if current is None:
+        del st.session_state['this_char']
+        st.rerun()
+    assert current is not None
+
+    # Select character
+    options = [row.id for row in page]
+    labels = {row.id: roster.display_name(row) for row in page}
+    st.sidebar.selectbox(
+        label="Character",
+        options=options,
+        index=options.index(current.id) if current.id in options else None,
+        format_func=lambda character_id: labels[character_id],
+        key='roster_select',
+        on_change=select_char
+    )
+    page_prev, page_next = st.sidebar.columns(2)
+    page_prev.button(label="Previous page", on_click=step_page, kwargs={"page": page, "direction": "prev"})
+    page_next.button(label="Next page", on_click=step_page, kwargs={"page": page, "direction": "next"})
 
-    final_df.drop('ilevel', axis=1, inplace=True)
-    
-    min_ilevel = final_df['average_ilevel'].min()
-    max_ilevel = final_df['average_ilevel'].max()
+    col1, col2, col3 = st.columns([1,8,1])
 
-    early = final_df['d_record_date'].min()
-    late = final_df['d_record_date'].max()
+    col1.button(
+        label="<",
+        on_click=step_char,
+        kwargs={"current": current, "direction": "prev"}
+    )
+    col2.subheader(body=roster.display_name(current))
+    col3.button(
+        label="\\>",
+        on_click=step_char,
+        kwargs={"current": current, "direction": "next"}
+    )
 
-    
-    fig, ax = plt.subplots()
+    this_char_id = current.id
+    version = watcher.version(this_char_id)
 
-    # Plot the line chart
-    ax.plot(
-        'd_record_date',
-        'average_ilevel',
-        data=final_df,
-        marker='o'
+    show_annotation_form(this_char_id)
+
+    # Filter progress records for the selected character
+    today = date.today()
+    char_data = get_weekly_progress(this_char_id, today, version)
+    save_kwargs = {"character_id": this_char_id, "today": today, "version": version}
+
+    st.toggle(
+        label='Pinnacle Quest Completed?',
+        value=char_data.pinnacle_quest_done,
+        key='pinnacle_done',
+        on_change=save_progress,
+        kwargs=save_kwargs
+    )
+    st.toggle(
+        label='Profession Quest 1 Completed?',
+        value=char_data.profession_1_quest_done,
+        key='prof_1_done',
+        on_change=save_progress,
+        kwargs=save_kwargs
+    )
+    st.toggle(
+        label='Profession Quest 2 Completed?',
+        value=char_data.profession_2_quest_done,
+        key='prof_2_done',
+        on_change=save_progress,
+        kwargs=save_kwargs
+    )
+    st.number_input(
+        label="Delves completed (today)",
+        value=char_data.todays_delves,
+        min_value=0,
+        key='todays_delves',
+        on_change=save_progress,
+        kwargs=save_kwargs
+    )
+    st.number_input(
+        label="Delves completed (This week)",
+        value=char_data.previous_delves+st.session_state['todays_delves'],
+        disabled=True
     )
 
-    annotations = get_annotations()
-    for a in annotations:
-        _year, _month, _day = a[0].split('-')
-        x_coord = date(int(_year), int(_month), int(_day))
-        ax.axvline(x=x_coord, color="black", linestyle="--")  # type: ignore
-        ax.annotate(a[1], xy=(x_coord, max_ilevel+8))  # type: ignore
-
-    ax.xaxis.set_major_locator(WeekdayLocator(byweekday=1, interval=1))
-    ax.xaxis.set_major_formatter(DateFormatter('%d %b'))
-
-
-    # Set x-axis limits
-    start_value = min_ilevel - 10  # Replace with your desired starting value
-    end_value = max_ilevel + 10
-    ax.set_ylim(start_value, end_value)
-    ax.set_xlim(early, late)
-
-    return fig, ax
-
-def get_logs(character: WoWCharacter, count: int = 30) -> Sequence[GearLog]:
-    global conn
-
-    with conn.session as s:
-        return s.scalars(
-            select(GearLog)
-            .where(GearLog.wow_character == character)
-            .where(GearLog.record_date >= (date.today() - timedelta(days=count)))
-            .order_by(GearLog.record_date.desc())
-        ).all()
-
-def get_annotations() -> List[List[str]]:
-    output = []
-    with open('ANNOTATIONS.csv', mode='r', newline='\n') as f:
-        ann = csv_reader(f, delimiter='|', quotechar='"')
-
-        for line in ann:
-            output.append(line)
-    
-    return output[1:]
-
-def prev_char(choices: List):
-    selected = st.session_state['this_char']
-    if selected in choices:
-        idx = choices.index(selected)
-        try:
-            st.session_state['this_char'] = choices[idx-1]
-        except KeyError:
-            pass
-    
-    return
-
-def next_char(choices: List):
-    selected = st.session_state['this_char']
-    if selected in choices:
-        idx = choices.index(selected)
-        try:
-            st.session_state['this_char'] = choices[idx+1]
-        except KeyError:
-            pass
-    
-    return
-    
+    ilvl_tab, slot_tab = st.tabs(["Item Level", "Slot Upgrades"])
+    with ilvl_tab:
+        show_history(this_char_id, version, watcher.annotations_version)
+    with slot_tab:
+        show_slot_heatmap(this_char_id, version, today)
 
-def main():
-    global conn
-    global VALID_SLOTS
-
-    with conn.session as s:
-        characters = []
-        #characters = [character.__dict__ for character in s.scalars(select(WoWCharacter)).all()]
-        for c in s.scalars(select(WoWCharacter)).all():
-            char_key = c.key
-            characters.append({
-                'key': char_key,
-                'obj': c,
-                'display': f"{c.name} ({c.realm}-{c.region.upper()})",
-                'region': c.region,
-                'name': c.name,
-                'realm': c.realm,
-                'level': c.level
-            })
-        
-        characters_df = pd.DataFrame(characters)
-        characters_df = characters_df[[col for col in characters_df.columns if not col.startswith('_')]]        
-        
-        st.title("Character Progress Tracker")
-
-        # Select character
-        st.session_state["this_char"] = characters_df['display'][0]
-        col1, col2, col3 = st.columns([1,8,1])
-
-        col1.button(
-            label="<",
-            on_click=prev_char,
-            kwargs={"choices": characters_df['display']}
-        )
-        col2.subheader(body=st.session_state["this_char"])
-        col3.button(
-            label="\>",
-            on_click=next_char,
-            kwargs={"choices": characters_df['display']}
-        )
 
-        this_char = [c['obj'] for c in characters if c['display'] == st.session_state["this_char"]][0]
-        assert(isinstance(this_char, WoWCharacter))
-        # Filter progress records for the selected character
-        char_data = get_todays_progress(s, this_char)
-        st.session_state['progress_id'] = char_data.id
-        st.session_state['previous_delves'] = char_data.delves_completed
-        char_data: CharacterProgress = s.scalar(
-            select(CharacterProgress)
-            .where(CharacterProgress.id == st.session_state['progress_id'])) # type: ignore
-
-        st.toggle(
-            label='Pinnacle Quest Completed?',
-            value=char_data.pinnacle_quest_done,
-            key='pinnacle_done'
-        )
-        st.toggle(
-            label='Profession Quest 1 Completed?',
-            value=char_data.profession_1_quest_done,
-            key='prof_1_done'
-        )
-        st.toggle(
-            label='Profession Quest 2 Completed?',
-            value=char_data.profession_2_quest_done,
-            key='prof_2_done'
-        )
-        st.number_input(
-            label="Delves completed (today)",
-            value=0,
-            key='todays_delves'
-        )
-        st.number_input(
-            label="Delves completed (This week)",
-            value=st.session_state['previous_delves']+st.session_state['todays_delves'],
-            disabled=True
+def show_query_debug(profiler: QueryProfiler, rerun: Optional[int]):
+    if rerun is None:
+        return
+
+    records = profiler.for_rerun(rerun)
+    sidebar = st.sidebar.expander("Query Debug", expanded=True)
+    sidebar.metric(label="Queries this rerun", value=len(records))
+    sidebar.metric(label="Query time this rerun", value=f"{sum(r.duration_ms for r in records):.1f} ms")
+    sidebar.dataframe(
+        pd.DataFrame(profiler.summary()),
+        hide_index=True
+    )
+    if query_profiler.SLOW_QUERY_LOG.exists():
+        sidebar.download_button(
+            label="Download slow query log",
+            data=query_profiler.SLOW_QUERY_LOG.read_bytes(),
+            file_name=query_profiler.SLOW_QUERY_LOG.name,
+            mime="application/jsonl"
         )
 
-        char_data.pinnacle_quest_done = st.session_state['pinnacle_done']
-        char_data.profession_1_quest_done = st.session_state['prof_1_done']
-        char_data.profession_2_quest_done = st.session_state['prof_2_done']
-        s.commit()
-        
-        fig, ax = get_gear_chart(this_char)
 
-        # Display the plot in Streamlit
-        st.pyplot(fig)
+def main():
+    # PROFILE=cprofile|sample writes one profile per rerun.
+    with profiling.profiled('streamlit'):
+        run()
+
+
+def run():
+    profiler = get_profiler()
+    debug = st.sidebar.toggle(label="Query debug", key='query_debug')
+    if 'query_rerun' in st.session_state:
+        rerun = profiler.resume_rerun(st.session_state.pop('query_rerun'))
+    else:
+        rerun = profiler.start_rerun(force=debug)
+
+    watcher = get_watcher()
+
+    view = st.sidebar.radio(label="View", options=["Character", "Roster Overview"])
+    if view == "Roster Overview":
+        show_overview(watcher)
+    else:
+        show_character(watcher)
+
+    if debug:
+        show_query_debug(profiler, rerun)
 
-    st.write("Disconnected!")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,213 @@
+import argparse
+import logging
+from datetime import date, timedelta
+from itertools import product
+from typing import List, Tuple
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from data_models import init_db
+import database
+import item_level
+import sql_commands as sql
+
+log = logging.getLogger(__name__)
+
+REGIONS = ('us', 'eu', 'kr', 'tw')
+REGION_WEIGHTS = (0.55, 0.35, 0.05, 0.05)
+REALMS = (
+    'icecrown', 'area-52', 'illidan', 'stormrage', 'tichondrius', 'sargeras',
+    'draenor', 'silvermoon', 'kazzak', 'ravencrest', 'azshara', 'hyjal',
+)
+MAX_LEVEL = 80
+# Share of characters at max level; the rest are spread over 10-79.
+MAX_LEVEL_SHARE = 0.7
+TWO_HANDED_SHARE = 0.4
+# Chance per slot per day of an upgrade, and how big one is.
+UPGRADE_CHANCE = 0.03
+UPGRADE_STEP = (3, 14)
+ILVL_CAP = 639
+# Characters per COPY transaction.
+BATCH_SIZE = 500
+
+ONE_HANDED_SLOTS = item_level.EQUIPPED_SLOTS
+TWO_HANDED_SLOTS = tuple(slot for slot in item_level.EQUIPPED_SLOTS if slot != 'OFF_HAND')
+
+GEAR_LOG_COPY = "COPY gear_log (character_id, record_date, slot, item_id, ilevel, name, quality, size) FROM STDIN"
+ILVL_SUMMARY_COPY = "COPY ilvl_summary (character_id, record_date, average_item_level, total_item_level, slots_equipped) FROM STDIN"
+PROGRESS_LOG_COPY = (
+    "COPY progress_log (character_id, character_level, record_date, average_item_level, "
+    "pinnacle_quest_done, profession_1_quest_done, profession_2_quest_done, delves_completed) FROM STDIN"
+)
+GEAR_EVENT_COPY = (
+    "COPY gear_event (character_id, record_date, slot, old_item_id, new_item_id, "
+    "old_ilevel, new_ilevel, old_name, new_name) FROM STDIN"
+)
+
+
+def character_keys(count: int, seed: int, prefix: str) -> List[Tuple[str, str, str, str, int]]:
+    rng = np.random.default_rng(seed)
+    regions = rng.choice(REGIONS, size=count, p=REGION_WEIGHTS)
+    realms = rng.choice(REALMS, size=count)
+    levels = np.where(
+        rng.random(count) < MAX_LEVEL_SHARE,
+        MAX_LEVEL,
+        rng.integers(10, MAX_LEVEL, size=count)
+    )
+
+    keys = []
+    for i, (region, realm, level) in enumerate(zip(regions, realms, levels)):
+        name = f'{prefix}{i:07d}'
+        keys.append((f'{region}|{realm}|{name}', str(region), str(realm), name, int(level)))
+    return keys
+
+
+def flag(values: np.ndarray) -> List[str]:
+    return np.where(values, 't', 'f').tolist()
+
+
+def character_history(character_id: int, index: int, level: int, seed: int, start: date, days: int) -> Tuple[str, str, str, str]:
+    """Generate one character's gear_log, ilvl_summary, progress_log and gear_event rows as COPY text.
+
+    Every character gets its own generator derived from (seed, index), so
+    the data is reproducible regardless of batch size or ordering. All the
+    numbers are drawn as whole (days, slots) arrays; the only per-row work
+    is joining them into text.
+    """
+    rng = np.random.default_rng([seed, index])
+
+    two_handed = rng.random() < TWO_HANDED_SHARE
+    slots = TWO_HANDED_SLOTS if two_handed else ONE_HANDED_SLOTS
+
+    base = rng.normal(560 if level == MAX_LEVEL else 450, 12, size=len(slots)).astype(np.int64)
+    upgrades = rng.random((days, len(slots))) < UPGRADE_CHANCE
+    steps = upgrades * rng.integers(*UPGRADE_STEP, size=(days, len(slots)))
+    ilevels = np.minimum(base + np.cumsum(steps, axis=0), ILVL_CAP)
+    item_ids = 200_000 + index * 1_000 + np.arange(len(slots)) * 50 + np.cumsum(upgrades, axis=0)
+    qualities = np.select([ilevels >= 580, ilevels >= 550], ['EPIC', 'RARE'], 'UNCOMMON')
+
+    # Same rule as item_level.total_item_level, vectorised over days.
+    totals = ilevels.sum(axis=1)
+    if two_handed:
+        totals += ilevels[:, slots.index('MAIN_HAND')]
+    averages = totals // item_level.SLOT_COUNT
+
+    dates = [(start + timedelta(days=d)).isoformat() for d in range(days)]
+    labels = [f'Synthetic {slot.title()}' for slot in slots]
+    main_hand_size = 'TWOHWEAPON' if two_handed else 'WEAPON'
+    sizes = [main_hand_size if slot == 'MAIN_HAND' else '\\N' for slot in slots]
+
+    gear_lines = [
+        f'{character_id}\t{dates[d]}\t{slots[s]}\t{item_id}\t{ilvl}\t{labels[s]} {item_id}\t{quality}\t{sizes[s]}\n'
+        for (d, s), item_id, ilvl, quality in zip(
+            product(range(days), range(len(slots))),
+            item_ids.ravel().tolist(),
+            ilevels.ravel().tolist(),
+            qualities.ravel().tolist(),
+        )
+    ]
+
+    summary_lines = [
+        f'{character_id}\t{record_date}\t{average}\t{total}\t{len(slots)}\n'
+        for record_date, average, total in zip(dates, averages.tolist(), totals.tolist())
+    ]
+
+    # Weekly chores get done on a random day of the reset week; delves are bursty.
+    pinnacle = flag(rng.random(days) < 1 / 7)
+    prof_1 = flag(rng.random(days) < 1 / 7)
+    prof_2 = flag(rng.random(days) < 1 / 7)
+    delves = rng.poisson(0.6, size=days).tolist()
+    progress_lines = [
+        f'{character_id}\t{level}\t{dates[d]}\t{average}\t{pinnacle[d]}\t{prof_1[d]}\t{prof_2[d]}\t{delves[d]}\n'
+        for d, average in enumerate(averages.tolist())
+    ]
+
+    # An upgrade swaps the item, so it is a change from the day before.
+    # The first day has nothing to compare against, like a first ingest.
+    changed_days, changed_slots = np.nonzero(upgrades[1:])
+    changed_days += 1
+    event_lines = [
+        f'{character_id}\t{dates[d]}\t{slots[s]}\t{old_id}\t{new_id}\t{old_ilvl}\t{new_ilvl}\t'
+        f'{labels[s]} {old_id}\t{labels[s]} {new_id}\n'
+        for d, s, old_id, new_id, old_ilvl, new_ilvl in zip(
+            changed_days.tolist(),
+            changed_slots.tolist(),
+            item_ids[changed_days - 1, changed_slots].tolist(),
+            item_ids[changed_days, changed_slots].tolist(),
+            ilevels[changed_days - 1, changed_slots].tolist(),
+            ilevels[changed_days, changed_slots].tolist(),
+        )
+    ]
+
+    return ''.join(gear_lines), ''.join(summary_lines), ''.join(progress_lines), ''.join(event_lines)
+
+
+def generate(characters: int, days: int, seed: int = 0, prefix: str = 'synth', start: date | None = None):
+    """Fill the database with `characters` x `days` of synthetic history via COPY.
+
+    Characters whose key already exists are left alone, so re-running with
+    the same arguments adds nothing.
+    """
+    if start is None:
+        start = date.today() - timedelta(days=days)
+
+    engine = database.get_engine()
+    with engine.begin() as conn:
+        init_db(conn)
+
+    keys = character_keys(characters, seed, prefix)
+
+    raw = engine.raw_connection()
+    try:
+        with raw.driver_connection.cursor() as cur:
+            cur.execute(sql.create_synthetic_staging_sql)
+            with cur.copy(sql.copy_synthetic_staging_sql) as copy:
+                for row in keys:
+                    copy.write_row(row)
+            cur.execute(sql.merge_synthetic_characters_sql)
+            ids = {key: character_id for character_id, key in cur.fetchall()}
+        raw.commit()
+
+        # (id, index, level) for each new character; the index seeds its history.
+        new = [(ids[key[0]], index, key[4]) for index, key in enumerate(keys) if key[0] in ids]
+        if len(new) < len(keys):
+            log.info(f'Skipping {len(keys) - len(new)} characters that already exist.')
+
+        for batch_start in tqdm(range(0, len(new), BATCH_SIZE)):
+            histories = [
+                character_history(character_id, index, level, seed, start, days)
+                for character_id, index, level in new[batch_start:batch_start + BATCH_SIZE]
+            ]
+            with raw.driver_connection.cursor() as cur:
+                for statement, rows in zip(
+                    (GEAR_LOG_COPY, ILVL_SUMMARY_COPY, PROGRESS_LOG_COPY, GEAR_EVENT_COPY),
+                    zip(*histories),
+                ):
+                    with cur.copy(statement) as copy:
+                        copy.write(''.join(rows))
+            raw.commit()
+    except Exception:
+        raw.rollback()
+        raise
+    finally:
+        raw.close()
+
+    log.info(f'Generated {len(new)} characters x {days} days starting {start}.')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fill a local database with synthetic roster history.')
+    parser.add_argument('--characters', type=int, default=1000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--prefix', default='synth', help='Name prefix for generated characters')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day of history (default: DAYS ago)')
+    args = parser.parse_args()
+
+    generate(args.characters, args.days, args.seed, args.prefix, args.start)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(encoding="utf-8", level=logging.INFO)
+    main()
@@ -0,0 +1,11 @@
+from calendar import TUESDAY
+from datetime import date, timedelta
+
+# Weekly quests and delve counts reset on Tuesday (US). A reset week runs
+# from one reset day up to, but not including, the next.
+RESET_WEEKDAY = TUESDAY
+
+
+def reset_week_start(day: date) -> date:
+    """The reset day that starts the week containing `day`."""
+    return day - timedelta(days=(day.weekday() - RESET_WEEKDAY) % 7)
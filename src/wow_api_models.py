@@ -1,6 +1,17 @@
-from typing import Any, Collection, Dict, List, Literal, Optional, Type, overload
+from functools import cache
+from typing import TYPE_CHECKING, Any, Collection, Dict, List, Literal, Optional, Type, overload
 import logging
-import requests
+import os
+
+import http_client
+import json_codec
+
+if TYPE_CHECKING:
+    from async_client import AsyncApiClient
+
+# Requests ask for one locale, so localized fields come back as plain
+# strings instead of a dict of every translation.
+DEFAULT_LOCALE = os.getenv("WOW_LOCALE", "en_US")
 
 
 # Error Classes
@@ -24,14 +35,29 @@ class AmbiguousFieldError(Exception):
     pass
 
 
+def localized(value: Dict[str, str] | str, locale: str) -> str:
+    """Pick `locale` out of a localized field.
+
+    A request made with `locale` set gets plain strings back; without it
+    the API sends every translation as a dict, which is still accepted.
+    """
+    if isinstance(value, str):
+        return value
+    if isinstance(value, Dict):
+        if locale in value:
+            return value[locale]
+        raise KeyError(f"The localized field does not have the desired locale ({locale}). Provided locales were: {', '.join(value.keys())}")
+    raise AttributeError(f"Localized field is of type `{type(value)}`. Expected either Dict or str.")
+
+
 # Return Type Placeholders
 class WoWDataApiReturnPlaceholder:
-    locale: str = "en_US"
+    locale: str = DEFAULT_LOCALE
     href: str
     default_field: str
 
     def __init__(self, **kwargs) -> None:
-        if "local" in kwargs.keys():
+        if "locale" in kwargs.keys():
             self.locale = kwargs.pop("locale")
 
         if "href" in kwargs.keys():
@@ -85,8 +111,8 @@ class WoWDataApiReturnPlaceholder:
         return obj[key]
 
     def _retrieve_from_href_get(self, auth: Dict[str, str]):
-        response = requests.get(url=self.href, headers=auth)
-        resp = response.json()
+        response = http_client.get(self.href, headers=auth)
+        resp = json_codec.loads(response.content)
         for key in resp:
             try:
                 setattr(self, key, resp[key])
@@ -94,8 +120,8 @@ class WoWDataApiReturnPlaceholder:
                 continue
 
     def _retrieve_from_href_post(self, auth: Dict[str, str]):
-        response = requests.post(url=self.href, headers=auth)
-        resp = response.json()
+        response = http_client.post(self.href, headers=auth)
+        resp = json_codec.loads(response.content)
         for key in resp:
             try:
                 setattr(self, key, resp[key])
@@ -116,15 +142,7 @@ class WoWCharacterGender(WoWDataApiReturnPlaceholder):
         if self.default_field not in obj.keys():
             raise KeyError(f'Key "{self.default_field}" not in object.keys ({", ".join(obj.keys())})')
         super().__init__(**kwargs)
-        if isinstance(obj[self.default_field], Dict):
-            if self.locale in obj[self.default_field].keys():
-                self.name = obj[self.default_field][self.locale]
-            else:
-                raise KeyError(f"The passed object's `{self.default_field}` key (a Dict) does not have the desired locale ({self.locale}). Provided locales were: {"', '".join(obj[self.default_field].keys())}")
-        elif isinstance(obj[self.default_field], str):
-            self.name = obj[self.default_field]
-        else:
-            raise AttributeError(f"The passed object's {obj[self.default_field]} key is of type `{type(obj[self.default_field])}`. Expected either Dict or str.")
+        self.name = localized(obj[self.default_field], self.locale)
 
 
 class WoWCharacterGenderName(WoWDataApiReturnPlaceholder):
@@ -135,9 +153,9 @@ class WoWCharacterGenderName(WoWDataApiReturnPlaceholder):
     def __init__(self, obj, **kwargs):
         super().__init__(**kwargs)
         male_name = self.assert_key_in_obj("male", obj, Dict)
-        self.male = WoWCharacterGender(male_name)
+        self.male = WoWCharacterGender(male_name, locale=self.locale)
         female_name = self.assert_key_in_obj("female", obj, Dict)
-        self.female = WoWCharacterGender(female_name)
+        self.female = WoWCharacterGender(female_name, locale=self.locale)
 
 
 class WoWCharacterPowerType(WoWDataApiReturnPlaceholder):
@@ -145,9 +163,9 @@ class WoWCharacterPowerType(WoWDataApiReturnPlaceholder):
     name: str
     id: int
 
-    def __init__(self, obj: Dict[str, Dict[str, str]]):
-        self.assert_key_in_obj("name", obj, Dict)
-        self.name = self.assert_key_in_obj(self.locale, obj["name"], str)
+    def __init__(self, obj: Dict[str, Any], **kwargs):
+        super().__init__(**kwargs)
+        self.name = localized(self.assert_key_in_obj("name", obj, (Dict, str)), self.locale)
         self.id = self.assert_key_in_obj("id", obj, int)
 
 
@@ -160,11 +178,10 @@ class WoWCharacterClass(WoWDataApiReturnPlaceholder):
     gender_name: WoWCharacterGender
     power_type: WoWCharacterPowerType
 
-    def __init__(self, obj: Dict[str, Dict[str, str]]):
+    def __init__(self, obj: Dict[str, Any], **kwargs):
+        super().__init__(**kwargs)
         self.href = self.assert_key_in_obj("href", obj, str)
-        self.assert_key_in_obj("name", obj, Dict)
-
-        self.name = self.assert_key_in_obj(self.locale, obj["name"], str)
+        self.name = localized(self.assert_key_in_obj("name", obj, (Dict, str)), self.locale)
 
         self.id = self.assert_key_in_obj("id", obj, int)
 
@@ -188,15 +205,7 @@ class WoWCharacterRace(WoWDataApiReturnPlaceholder):
         if self.default_field not in obj.keys():
             raise KeyError(f'Key "{self.default_field}" not in object.keys ({", ".join(obj.keys())})')
         super().__init__(**kwargs)
-        if isinstance(obj[self.default_field], Dict):
-            if self.locale in obj[self.default_field].keys():
-                self.name = obj[self.default_field][self.locale]
-            else:
-                raise KeyError(f"The passed object's `{self.default_field}` key (a Dict) does not have the desired locale ({self.locale}). Provided locales were: {"', '".join(obj[self.default_field].keys())}")
-        elif isinstance(obj[self.default_field], str):
-            self.name = obj[self.default_field]
-        else:
-            raise AttributeError(f"The passed object's {obj[self.default_field]} key is of type `{type(obj[self.default_field])}`. Expected either Dict or str.")
+        self.name = localized(obj[self.default_field], self.locale)
 
     def retrieve_from_href(self, auth) -> bool:
         return True
@@ -211,15 +220,7 @@ class WoWCharacterFaction(WoWDataApiReturnPlaceholder):
         if self.default_field not in obj.keys():
             raise KeyError(f'Key "{self.default_field}" not in object.keys ({", ".join(obj.keys())})')
         super().__init__(**kwargs)
-        if isinstance(obj[self.default_field], Dict):
-            if self.locale in obj[self.default_field].keys():
-                self.name = obj[self.default_field][self.locale]
-            else:
-                raise KeyError(f"The passed object's `{self.default_field}` key (a Dict) does not have the desired locale ({self.locale}). Provided locales were: {"', '".join(obj[self.default_field].keys())}")
-        elif isinstance(obj[self.default_field], str):
-            self.name = obj[self.default_field]
-        else:
-            raise AttributeError(f"The passed object's {obj[self.default_field]} key is of type `{type(obj[self.default_field])}`. Expected either Dict or str.")
+        self.name = localized(obj[self.default_field], self.locale)
 
 
 class WoWEquipmentItem(WoWDataApiReturnPlaceholder):
@@ -242,6 +243,16 @@ class WoWEquipmentItem(WoWDataApiReturnPlaceholder):
     def __init__(self, **kwargs) -> None:
         super().__init__(**kwargs)
 
+@cache
+def model_classes() -> Dict[str, Type[WoWDataApiReturnPlaceholder]]:
+    """Response key -> model class, e.g. `race` -> `WoWCharacterRace`."""
+    return {
+        sub.__name__.lower().removeprefix('wowcharacter'): sub
+        for sub in WoWDataApiReturnPlaceholder.__subclasses__()
+        if sub.__name__.lower().startswith('wowcharacter')
+    }
+
+
 # Endpoints
 class WoWRetailApiEndpoint:
     _log: logging.Logger
@@ -283,12 +294,13 @@ class WoWRetailApiEndpoint:
 
         self.region = region
         self.realm = realm
+        self.realm_slug = realm.lower().strip()
         self.character_name = character_name
 
         if 'locale' in kwargs.keys():
             self.locale = kwargs['locale']
         else:
-            self.locale = 'en_US'
+            self.locale = DEFAULT_LOCALE
 
         if oauth_token:
             self._oauth_token = oauth_token
@@ -306,28 +318,31 @@ class WoWRetailApiEndpoint:
         auth = {"Authorization": f"Bearer {self._oauth_token}"}
         self.realm_slug = self.realm.lower().strip()
         params = {
-            "namespace": "dynamic-us",
+            "namespace": f"dynamic-{self.region}",
+            "locale": self.locale,
             "_page": 1,
             "_pageSize": 10,
             "orderby": "name",
             "slug": self.realm_slug,
         }
 
-        response = requests.get(
-            url=f"{self.base_url}{endpoint}", params=params, headers=auth
+        response = http_client.get(
+            f"{self.base_url}{endpoint}", params=params, headers=auth
         )
 
-        if len(response.json()["results"]) == 1:
+        results = json_codec.loads(response.content)["results"]
+
+        if len(results) == 1:
             self._log.debug(f"Realm slug {self.realm_slug} appears valid!")
-            self.realm = response.json()["results"][0]["data"]["name"]["en_US"]
+            self.realm = localized(results[0]["data"]["name"], self.locale)
             self._log.debug(self.realm)
-        elif len(response.json()["results"]) > 1:
+        elif len(results) > 1:
             msg = f"Realm slug {self.realm_slug} returned multiple results:"
             msg += "\n\t"
             msg += ",\n".join(
                 [
-                    f"\t{realm['data']['name']['en_US']}"
-                    for realm in response.json()["results"]
+                    f"\t{localized(realm['data']['name'], self.locale)}"
+                    for realm in results
                 ]
             )
             raise AmbiguousRealmError(msg)
@@ -393,6 +408,8 @@ class CharacterProfileSummary(WoWRetailApiEndpoint):
             super_params['oauth_token'] = kwargs['token']
         if 'log_level' in kwargs.keys():
             super_params['log_level'] = kwargs['log_level']
+        if 'locale' in kwargs.keys():
+            super_params['locale'] = kwargs['locale']
         
         super().__init__(
             **super_params
@@ -408,39 +425,51 @@ class CharacterProfileSummary(WoWRetailApiEndpoint):
         
         self._log.info(f'Retrieving data for {self.character_name}...')
 
-        params = {":region": self.region, "namespace": f"profile-{self.region}", "locale": self.locale}
-
-        resp = requests.get(
-            url=f"{self.base_url}/{self.endpoint.format_map({
-                "realm_slug":self.realm_slug,
-                "character_name":self.character_name
-            })}",
-            params=params,
+        resp = http_client.get(
+            self.url(),
+            params=self.params(),
             headers={"Authorization": f"Bearer {self._oauth_token}"}
         )
 
         # resp.raise_for_status()
-        
-        resp = resp.json()
 
+        return self.load(json_codec.loads(resp.content))
+
+    async def retrieve_async(self, client: "AsyncApiClient") -> Dict[str, str | int | Any]:
+        """`retrieve` over the shared HTTP/2 client, which holds the token.
+
+        The realm is not validated first; an unknown realm shows up as a
+        404 for the profile itself.
+        """
+        self._log.info(f'Retrieving data for {self.character_name}...')
+        return self.load(await client.get_json(self.url(), self.params()))
+
+    def url(self) -> str:
+        return f"{self.base_url}/{self.endpoint.format_map({
+            "realm_slug":self.realm_slug,
+            "character_name":self.character_name
+        })}"
+
+    def params(self) -> Dict[str, str]:
+        return {":region": self.region, "namespace": f"profile-{self.region}", "locale": self.locale}
+
+    def load(self, resp: Dict[str, Any]) -> Dict[str, str | int | Any]:
+        """Populate this summary from a decoded profile response.
+
+        Keys with a model (`gender` -> `WoWCharacterGender`, ...) are decoded
+        in this summary's locale; other scalar keys are copied as they are.
+        """
+        models = model_classes()
         processed_keys = []
-        for key in resp.keys():
-            self._log.debug(f'Processing key `{key}`')
-
-            for sub in WoWDataApiReturnPlaceholder.__subclasses__():
-                if f'wowcharacter{key}' == sub.__name__.lower():
-                    self._log.debug(f'Found class {sub.__name__}')
-                    self._log.debug(f'Passing object with keys: {', '.join(resp[key].keys())}')
-                    out = sub(obj=resp[key])
-                    setattr(self, key, out)
-                    self._log.debug(f'self.{key} = {getattr(self, key)}')
-                    processed_keys.append(key)
-                else:
-                    self._log.debug(f"Didn't find a class for {key}")
-                    self._log.debug('-'*50)
-                    self._log.debug(resp[key])
-                    self._log.debug('-'*50)
-        
+        for key, value in resp.items():
+            model = models.get(key)
+            if model is None or not isinstance(value, Dict):
+                continue
+
+            self._log.debug(f'Decoding `{key}` as {model.__name__}')
+            setattr(self, key, model(obj=value, locale=self.locale))
+            processed_keys.append(key)
+
         remaining_keys = resp.keys() - processed_keys
 
         for key in remaining_keys:
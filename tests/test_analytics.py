@@ -0,0 +1,21 @@
+from datetime import date
+
+import pandas as pd
+
+import analytics
+
+
+def test_slot_upgrades_with_two_hander():
+    # A two-hander leaves OFF_HAND NULL on every day.
+    slot_history = pd.DataFrame({
+        'record_date': [date(2024, 9, 10), date(2024, 9, 11), date(2024, 9, 12)],
+        'HEAD': [600, 606, 606],
+        'MAIN_HAND': [610, None, 619],
+        'OFF_HAND': [None, None, None],
+    }).set_index('record_date')
+
+    levels, upgrades = analytics.slot_upgrades(slot_history)
+
+    assert list(levels.columns) == ['HEAD', 'MAIN_HAND']
+    assert upgrades['HEAD'].tolist() == [False, True, False]
+    assert upgrades['MAIN_HAND'].tolist() == [False, False, True]
@@ -0,0 +1,36 @@
+import asyncio
+import gzip
+import json
+
+import httpx
+
+import async_client
+import http_client
+
+
+def gzip_transport(payload: dict) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(
+            200,
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+            content=gzip.compress(json.dumps(payload).encode()),
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def test_recording_transport_returns_decoded_gzip_body(tmp_path):
+    payload = {'access_token': 'secret', 'name': 'Littlegizmo'}
+    path = tmp_path / 'http.jsonl.gz'
+
+    async def fetch():
+        transport = async_client.RecordingTransport(path, gzip_transport(payload))
+        async with httpx.AsyncClient(transport=transport) as client:
+            response = await client.get('https://us.api.blizzard.com/profile')
+            return response.json()
+
+    assert asyncio.run(fetch()) == payload
+
+    fixtures = http_client.load_archive(path)
+    entry = fixtures['GET https://us.api.blizzard.com/profile']
+    assert json.loads(entry['body']) == {'access_token': http_client.REDACTED, 'name': 'Littlegizmo'}
@@ -0,0 +1,17 @@
+from datetime import date, timedelta
+
+import chart_render
+
+
+def test_new_chart_replaces_the_old_one(tmp_path, monkeypatch):
+    monkeypatch.setattr(chart_render, 'CHART_DIR', tmp_path)
+    start = date(2024, 9, 10)
+    history = [(start + timedelta(days=d), 600 + d) for d in range(5)]
+
+    first = chart_render.render_chart(7, history, [])
+    second = chart_render.render_chart(7, history + [(start + timedelta(days=5), 606)], [(start, 'Season start')])
+    other = chart_render.render_chart(8, history, [])
+
+    assert second != first
+    assert list((tmp_path / '7').iterdir()) == [second]
+    assert list((tmp_path / '8').iterdir()) == [other]
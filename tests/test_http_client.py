@@ -0,0 +1,74 @@
+import gzip
+import json
+
+import pytest
+import requests
+from requests.adapters import HTTPAdapter
+
+import http_client
+
+SECRET = 'tok3n-that-must-not-leak'
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    """Answer every real send with a canned JSON body instead of touching the network."""
+    payload = {'access_token': SECRET, 'name': 'Littlegizmo', 'level': 80}
+
+    def send(self, request, *args, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = 'OK'
+        response.headers['Content-Type'] = 'application/json;charset=UTF-8'
+        response.headers['X-Trace-Id'] = 'abc'
+        response._content = json.dumps(payload).encode()
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        return response
+
+    monkeypatch.setattr(HTTPAdapter, 'send', send)
+    return payload
+
+
+def test_record_then_replay(tmp_path, fake_api):
+    path = tmp_path / 'http.jsonl.gz'
+    url = 'https://us.api.blizzard.com/profile/wow/character/icecrown/littlegizmo'
+
+    recorded = http_client.build_session('record', path).get(url, params={'namespace': 'profile-us', 'locale': 'en_US'})
+    assert recorded.json() == fake_api
+
+    # Query order doesn't matter for a replay, and no network is needed.
+    replayed = http_client.build_session('replay', path).get(url, params={'locale': 'en_US', 'namespace': 'profile-us'})
+    assert replayed.status_code == 200
+    assert replayed.headers['Content-Type'] == 'application/json;charset=UTF-8'
+    assert 'X-Trace-Id' not in replayed.headers
+    assert replayed.json() == {**fake_api, 'access_token': http_client.REDACTED}
+
+    with pytest.raises(http_client.FixtureMissingError):
+        http_client.build_session('replay', path).get(f'{url}/equipment')
+
+
+def test_recorded_fixtures_hold_no_tokens(tmp_path, fake_api):
+    path = tmp_path / 'http.jsonl.gz'
+    http_client.build_session('record', path).post(
+        'https://oauth.battle.net/token',
+        data={'grant_type': 'client_credentials'},
+    )
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        assert SECRET not in f.read()
+
+
+def test_scrub_removes_tokens():
+    body = json.dumps({'access_token': SECRET, 'refresh_token': SECRET, 'note': f'Bearer {SECRET}', 'id': 1})
+    scrubbed = json.loads(http_client.scrub(body))
+    assert scrubbed == {
+        'access_token': http_client.REDACTED,
+        'refresh_token': http_client.REDACTED,
+        'note': f'Bearer {http_client.REDACTED}',
+        'id': 1,
+    }
+
+    # Bodies that aren't JSON still lose bearer credentials.
+    assert http_client.scrub(f'<p>Authorization: Bearer {SECRET}</p>') == f'<p>Authorization: Bearer {http_client.REDACTED}</p>'
@@ -0,0 +1,23 @@
+import pytest
+
+import json_codec
+
+
+def test_equipped_items_rejects_error_body():
+    with pytest.raises(KeyError):
+        json_codec.equipped_items(b'{"code": 404, "type": "BLZWEBAPI00000404", "detail": "Not Found"}')
+
+
+@pytest.mark.skipif(not json_codec.TYPED_EXTRACTION, reason='needs msgspec')
+def test_equipped_items_keeps_stored_fields_only():
+    body = (
+        b'{"equipped_items": [{"slot": {"type": "HEAD", "name": "Head"}, "item": {"id": 1},'
+        b' "name": "Helm", "level": {"value": 600}, "quality": {"type": "EPIC"}, "stats": [1, 2]}]}'
+    )
+    assert json_codec.equipped_items(body) == [{
+        'slot': {'type': 'HEAD'},
+        'item': {'id': 1},
+        'name': 'Helm',
+        'level': {'value': 600},
+        'quality': {'type': 'EPIC'},
+    }]
@@ -0,0 +1,29 @@
+import threading
+
+import profiling
+
+
+def test_concurrent_cprofile_blocks_do_not_fail(tmp_path):
+    inside = threading.Event()
+    release = threading.Event()
+    errors = []
+
+    def first():
+        with profiling.profiled('first', 'cprofile', out_dir=tmp_path):
+            inside.set()
+            release.wait()
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    inside.wait()
+    try:
+        with profiling.profiled('second', 'cprofile', out_dir=tmp_path):
+            sum(range(100))
+    except ValueError as e:
+        errors.append(e)
+    finally:
+        release.set()
+        thread.join()
+
+    assert not errors
+    assert [path.name.split('-')[0] for path in tmp_path.glob('*.prof')] == ['first']
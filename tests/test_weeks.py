@@ -0,0 +1,19 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+import analytics
+import weeks
+
+
+def test_reset_week_starts_on_tuesday():
+    # 2024-09-10 was a Tuesday.
+    assert weeks.reset_week_start(date(2024, 9, 10)) == date(2024, 9, 10)
+    assert weeks.reset_week_start(date(2024, 9, 16)) == date(2024, 9, 10)
+    assert weeks.reset_week_start(date(2024, 9, 17)) == date(2024, 9, 17)
+
+
+def test_vectorised_week_start_matches():
+    days = [date(2024, 9, 1) + timedelta(days=d) for d in range(21)]
+    vectorised = analytics.reset_week_starts(np.array(days, dtype='datetime64[D]'))
+    assert vectorised.tolist() == [weeks.reset_week_start(day) for day in days]
@@ -2,7 +2,7 @@
 SELECT
     c.name,
     c.id,
-    max(l.average_item_level) as ilvl,
+    max(s.average_item_level) as ilvl,
     bool_or(l.pinnacle_quest_done) as pinnacle,
     bool_or(profession_1_quest_done) as prof_1,
     bool_or(profession_2_quest_done) as prof_2,
@@ -10,13 +10,16 @@ SELECT
 FROM progress_log as l
 LEFT JOIN wow_character as c
     ON l.character_id = c.id
+LEFT JOIN ilvl_summary as s
+    ON s.character_id = l.character_id
+   AND s.record_date = l.record_date
 WHERE 1=1
   AND (false
     OR c.level = 80
     OR c.level is NULL
   )
-  AND l.record_date >= '2024-12-31'
-  --date_trunc('week', current_date - interval '1 week') + interval '2 day'
+  -- Start of the current reset week (Tuesday); see weeks.reset_week_start
+  AND l.record_date >= (date_trunc('week', current_date - 1) + interval '1 day')::date
 GROUP BY c.name, c.id;
 
 SELECT